@@ -0,0 +1,65 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""Compiled valid pixel selection for raster2df."""
+
+import numpy as np
+
+ctypedef fused pixel_t:
+    signed char
+    unsigned char
+    short
+    unsigned short
+    int
+    unsigned int
+    long long
+    unsigned long long
+    float
+    double
+
+
+def valid_pixels(const pixel_t[:, :] arr, double nodata):
+    """
+    Description
+    -----------
+    Compiled version of the valid pixel selection in _read_valid_pixels.
+    Counts the pixels greater than nodata, then fills the row-major output
+    in a second pass; NaN never compares greater.
+
+    Parameters
+    ----------
+    arr: np.ndarray
+        a 2D window of a raster band
+    nodata: float
+        the nodata value; only pixels greater than it are kept
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray, np.ndarray): the row, column and value of each
+    valid pixel; the values keep the dtype of arr.
+    """
+    cdef Py_ssize_t nrows = arr.shape[0]
+    cdef Py_ssize_t ncols = arr.shape[1]
+    cdef Py_ssize_t i, j
+    cdef Py_ssize_t n = 0
+
+    for i in range(nrows):
+        for j in range(ncols):
+            if arr[i, j] > nodata:
+                n += 1
+
+    rows = np.empty(n, np.int64)
+    cols = np.empty(n, np.int64)
+    values = np.empty(n, np.asarray(arr).dtype)
+    cdef long long[::1] rows_view = rows
+    cdef long long[::1] cols_view = cols
+    cdef pixel_t[::1] values_view = values
+
+    n = 0
+    for i in range(nrows):
+        for j in range(ncols):
+            if arr[i, j] > nodata:
+                rows_view[n] = i
+                cols_view[n] = j
+                values_view[n] = arr[i, j]
+                n += 1
+
+    return rows, cols, values
@@ -6,7 +6,7 @@ import click
 import pandas as pd
 
 from .download import download_and_clean
-from .mixmasta import geocode, netcdf2df, process, raster2df, normalizer, optimize_df_types, mixdata
+from .mixmasta import csv2df, geocode, netcdf2df, parquet_suffix, process, raster2df, normalizer, optimize_df_types, mixdata
 #from download import download_and_clean
 #from mixmasta import geocode, netcdf2df, process, raster2df, normalizer, optimize_df_types, mixdata
 
@@ -21,6 +21,7 @@ import timeit
 CHUNK_SIZE = 100000
 DATA_TEMP_FILENAME = 'causmosify_multi_tmp'
 PROCESSED_TEMP_FILENAME = 'processed_tmp'
+PARQUET_COMPRESSIONS = ["gzip", "snappy", "brotli", "lz4", "zstd", "none"]
 
 @click.group()
 def cli():
@@ -86,7 +87,7 @@ def chunk_normalize(input_file: str, mapper: dict, renamed_col_dict: dict, geo:
     elif ftype != "csv":
         df = netcdf2df(input_file)
     else:
-        df = pd.read_csv(input_file)
+        df = csv2df(input_file, mapper)
 
     df.reset_index(inplace=True, drop=True)
     
@@ -191,9 +192,12 @@ def glob_input_file(input_file: str) -> str:
 @click.option("--mapper", type=str, default=None)
 @click.option("--geo", type=str, default=None)
 @click.option("--output_file", type=str, default="mixmasta_output")
-def causemosify(input_file, mapper, geo: str = None, output_file: str = "mixmasta_output"):
+@click.option("--compression", type=click.Choice(PARQUET_COMPRESSIONS), default="gzip")
+def causemosify(input_file, mapper, geo: str = None, output_file: str = "mixmasta_output", compression: str = "gzip"):
     """Processor for generating CauseMos compliant datasets."""
     click.echo("Causemosifying data...")
+    if compression == "none":
+        compression = None
 
     input_file =  glob_input_file(input_file)
     
@@ -225,18 +229,19 @@ def causemosify(input_file, mapper, geo: str = None, output_file: str = "mixmast
         os.remove(fl)
     
     # Write separate parquet files.
-    df_final['type'] = df_final[['value']].applymap(type)
+    df_final['type'] = df_final['value'].map(type)
     df_final_str = df_final[df_final['type']==str]
     df_final = df_final[df_final['type']!=str]
     del(df_final_str['type'])
     del(df_final['type'])
 
-    df_final.to_parquet(f"{output_file}.parquet.gzip", compression="gzip")
+    suffix = parquet_suffix(compression)
+    df_final.to_parquet(f"{output_file}{suffix}", compression=compression)
     if not df_final_str.empty:
-        df_final_str.to_parquet(f"{output_file}_str.parquet.gzip", compression="gzip")
+        df_final_str.to_parquet(f"{output_file}_str{suffix}", compression=compression)
     
     # Rebuild and reduce memory size of returned dataframe.
-    df_final = df_final.append(df_final_str)
+    df_final = pd.concat([df_final, df_final_str])
     df_final = optimize_df_types(df_final)
     df_final.reset_index(inplace=True, drop=True)
 
@@ -247,7 +252,8 @@ def causemosify(input_file, mapper, geo: str = None, output_file: str = "mixmast
 @click.option("--inputs", type=str, default=None)
 @click.option("--geo", type=str, default=None)
 @click.option("--output-file", type=str, default="mixmasta_output")
-def causemosify_multi(inputs, geo: str = None, output_file: str = "mixmasta_output"):
+@click.option("--compression", type=click.Choice(PARQUET_COMPRESSIONS), default="gzip")
+def causemosify_multi(inputs, geo: str = None, output_file: str = "mixmasta_output", compression: str = "gzip"):
     """Process multiple input files to generate a single CauseMos compliant dataset."""
 
     """
@@ -260,11 +266,15 @@ def causemosify_multi(inputs, geo: str = None, output_file: str = "mixmasta_outp
                 \"mapper\": \"build-a-date-qualifier.json\"}]"  
     
 
-        Writes separate parquet files for each input file.
+        Writes separate parquet files for each input file, compressed with
+        --compression (gzip by default).
     """
 
     input_array = json.loads(inputs)   
     click.echo(f"Causemosifying {len(input_array)} file(s) ...")
+    if compression == "none":
+        compression = None
+    suffix = parquet_suffix(compression)
     
     # Setup variables.
     renamed_col_dict = {}
@@ -364,16 +374,16 @@ def causemosify_multi(inputs, geo: str = None, output_file: str = "mixmasta_outp
        
         # Write separate parquet files depending on type of value column ...
         # ... by creating a separting df for value col of type str ...
-        df_final['type'] = df_final[['value']].applymap(type)
+        df_final['type'] = df_final['value'].map(type)
         df_final_str = df_final[df_final['type']==str]
         df_final = df_final[df_final['type']!=str]
         del(df_final_str['type'])
         del(df_final['type'])
 
         # ... now write the files.
-        df_final.to_parquet(f"{output_file}.{idx+1}.parquet.gzip", compression="gzip")
+        df_final.to_parquet(f"{output_file}.{idx+1}{suffix}", compression=compression)
         if not df_final_str.empty:
-            df_final_str.to_parquet(f"{output_file}_str.{idx+1}.parquet.gzip", compression="gzip")
+            df_final_str.to_parquet(f"{output_file}_str.{idx+1}{suffix}", compression=compression)
 
     # Causemosify-multi does not return the dataframe or dict.
 
@@ -433,6 +443,8 @@ def mix(xform, geo, input_file, output_file, feature_name, band, nodataval, date
 
     elif xform == "geocode":
 
+        # No mapper to pin column types, so keep the C parser's inference:
+        # pyarrow would turn ISO date columns into dates and change the CSV.
         df = pd.read_csv(input_file)
 
         if geo != None:
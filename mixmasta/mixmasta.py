@@ -2,10 +2,14 @@
 import json
 import logging
 import click
+import functools
 import os
+import re
 import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from typing import List
+from typing import List, Union
 from distutils.util import strtobool
 
 import geofeather as gf
@@ -13,11 +17,19 @@ import geopandas as gpd
 import numpy as np
 import pandas as pd
 from pandas.core.frame import DataFrame
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
 import requests
 import xarray as xr
-from osgeo import gdal, gdalconst
+from osgeo import gdal, gdal_array, gdalconst
 from shapely import speedups
-from shapely.geometry import Point
+
+try:
+    from numba import njit, prange
+except ImportError:
+    # numba is optional; raster2df falls back to numpy without it.
+    njit = None
 
 from pathlib import Path
 import pkg_resources
@@ -48,6 +60,9 @@ GEO_TYPE_ADMIN1  = "state/territory"
 GEO_TYPE_ADMIN2  = "county/district"
 GEO_TYPE_ADMIN3  = "municipality/town"
 
+# Pixels read from a raster band per window in raster2df.
+RASTER_WINDOW_PIXELS = 1 << 24
+
 if not sys.warnoptions:
     import warnings
     warnings.simplefilter("ignore")
@@ -94,7 +109,8 @@ def build_date_qualifies_field(qualified_col_dict: dict, assoc_fields: list) ->
     column e.g. day/month/year are associated and qualify a field. In this
     case, the new_column_name.
 
-    if assoc_fields is found as a value in qualified_col_dict, return the key
+    if assoc_fields is found as a value in qualified_col_dict, return the key.
+    The order of the fields does not matter.
 
     Parameters
     ----------
@@ -105,12 +121,198 @@ def build_date_qualifies_field(qualified_col_dict: dict, assoc_fields: list) ->
         ['month_column', 'day_column', 'year_column']
 
     """
+    # A plain scan: the dict is small and changes between calls, so an index
+    # would be rebuilt every time. The first matching column wins.
+    assoc_fields = sorted(assoc_fields)
     for k, v in qualified_col_dict.items():
-        if v == assoc_fields:
+        if sorted(v) == assoc_fields:
             return k
 
     return None
 
+# Day, month and year columns of a date mapper and their time formats; a
+# missing date_type is None.
+DateMapperView = namedtuple(
+    "DateMapperView", "day_col month_col year_col day_fmt month_fmt year_fmt"
+)
+
+def _parse_date_mapper(date_mapper: dict) -> DateMapperView:
+    """
+    Description
+    -----------
+    Collect the day/month/year columns and time formats of a date mapper in
+    a single pass, so callers read attributes instead of re-walking the dict.
+
+    Parameters
+    ----------
+    date_mapper: dict
+        a schema mapping (JSON) for the dataframe filtered for "date_type"
+        equal to Day, Month, or Year.
+
+    Returns
+    -------
+    DateMapperView
+    """
+    cols = {"day": None, "month": None, "year": None}
+    fmts = {"day": None, "month": None, "year": None}
+
+    for kk, vv in date_mapper.items():
+        if vv and vv["date_type"] in cols:
+            cols[vv["date_type"]] = kk
+            fmts[vv["date_type"]] = vv.get("time_format")
+
+    return DateMapperView(
+        cols["day"], cols["month"], cols["year"],
+        fmts["day"], fmts["month"], fmts["year"],
+    )
+
+# strptime directives handled by the compiled time parsers below; the patterns
+# mirror those used by CPython's _strptime so parsing behaves identically.
+TIME_DIRECTIVES = {
+    "Y": r"(?P<Y>\d\d\d\d)",
+    "y": r"(?P<y>\d\d)",
+    "m": r"(?P<m>1[0-2]|0[1-9]|[1-9])",
+    "d": r"(?P<d>3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9])",
+    "H": r"(?P<H>2[0-3]|[0-1]\d|\d)",
+    "M": r"(?P<M>[0-5]\d|\d)",
+    "S": r"(?P<S>6[0-1]|[0-5]\d|\d)",
+}
+
+# Cache of time_format: compiled parser (or None when strptime is required).
+_time_parsers = {}
+
+# ISO formats datetime.fromisoformat can parse: expected string length.
+ISO_TIME_FORMATS = {
+    "%Y-%m-%d": 10,
+    "%Y-%m-%dT%H:%M:%S": 19,
+    "%Y-%m-%d %H:%M:%S": 19,
+}
+
+def compile_time_format(time_format: str):
+    """
+    Description
+    -----------
+    Build a parser for a strftime `time_format` that only uses the numeric
+    directives in TIME_DIRECTIVES. The format is split into a compiled regex
+    once, so each call skips the format parsing done by datetime.strptime.
+
+    Parameters
+    ----------
+    time_format: str
+        the strftime format e.g. "%m/%d/%Y"
+
+    Returns
+    -------
+    function or None:
+        parser taking a time string and returning a datetime; raises ValueError
+        when the string does not match. None if the format needs strptime.
+    """
+    pattern = []
+    seen = set()
+    i = 0
+    while i < len(time_format):
+        char = time_format[i]
+        if char == "%":
+            directive = time_format[i + 1: i + 2]
+            if directive == "%":
+                pattern.append("%")
+            elif directive in TIME_DIRECTIVES and directive not in seen:
+                pattern.append(TIME_DIRECTIVES[directive])
+                seen.add(directive)
+            else:
+                # Unsupported or repeated directive: leave it to strptime.
+                return None
+            i += 2
+        elif char.isspace():
+            pattern.append(r"\s+")
+            while i < len(time_format) and time_format[i].isspace():
+                i += 1
+        else:
+            pattern.append(re.escape(char))
+            i += 1
+
+    regex = re.compile("".join(pattern) + r"\Z", re.IGNORECASE)
+
+    def parser(t: str) -> datetime:
+        found = regex.match(t)
+        if found is None:
+            raise ValueError(f"time data {t!r} does not match format {time_format!r}")
+        fields = found.groupdict()
+        if "Y" in fields:
+            year = int(fields["Y"])
+        elif "y" in fields:
+            year = int(fields["y"])
+            year += 2000 if year <= 68 else 1900
+        else:
+            year = 1900
+        return datetime(
+            year,
+            int(fields.get("m", 1)),
+            int(fields.get("d", 1)),
+            int(fields.get("H", 0)),
+            int(fields.get("M", 0)),
+            int(fields.get("S", 0)),
+        )
+
+    return parser
+
+def csv2df(fp: str, mapper: dict = None) -> pd.DataFrame:
+    """
+    Description
+    -----------
+    Read a CSV file with pyarrow's multithreaded parser, falling back to the
+    default C parser when the pyarrow engine is unavailable (pandas < 1.4) or
+    cannot parse the file. The mapper's date_type "date" columns, the
+    day/month/year columns of a primary or associated date group, geo
+    columns other than latitude and longitude, str features and columns that
+    qualify another are parsed as strings, so pyarrow does not infer dates,
+    timestamps or numbers for them (which would drop leading zeros, e.g. "03"
+    or "007"). Epoch, latitude, longitude and standalone day/month/year
+    columns are left to type inference, as they stay numeric in the output.
+
+    Parameters
+    ----------
+    fp: str
+        the path of the CSV file
+    mapper: dict, default None
+        the schema mapping (JSON) for the file
+
+    Examples
+    --------
+
+    >>> df = csv2df('data.csv', mapper)
+    """
+    dtype = {}
+    if mapper:
+        for field in mapper.get("date", []):
+            date_type = field.get("date_type")
+            if date_type == "date" or (
+                date_type in ("day", "month", "year")
+                and (field.get("primary_date") or field.get("associated_columns"))
+            ) or (date_type != "epoch" and field.get("qualifies")):
+                dtype[field["name"]] = str
+        for field in mapper.get("geo", []):
+            # Coordinates stay numeric for geocoding.
+            if field.get("geo_type") not in ("latitude", "longitude"):
+                dtype[field["name"]] = str
+        for field in mapper.get("feature", []):
+            if field.get("feature_type") in ("str", "string") or field.get("qualifies"):
+                dtype[field["name"]] = str
+
+    try:
+        if not dtype:
+            return pd.read_csv(fp, engine="pyarrow")
+
+        # pandas' pyarrow engine applies dtype after inference, so string
+        # columns are typed in pyarrow's own reader instead.
+        convert_options = pv.ConvertOptions(
+            column_types={name: pa.string() for name in dtype},
+            strings_can_be_null=True,
+        )
+        return pv.read_csv(fp, convert_options=convert_options).to_pandas()
+    except (ImportError, ValueError):
+        return pd.read_csv(fp)
+
 def format_time(t: str, time_format: str, validate: bool = True) -> int:
     """
     Description
@@ -132,8 +334,18 @@ def format_time(t: str, time_format: str, validate: bool = True) -> int:
     >>> epoch = format_time('5/12/20 12:20', '%m/%d/%y %H:%M')
     """
 
+    if time_format not in _time_parsers:
+        _time_parsers[time_format] = compile_time_format(time_format)
+    parser = _time_parsers[time_format]
+
     try:
-        t_ = int(datetime.strptime(t, time_format).timestamp()) * 1000 # Want milliseonds
+        if is_iso_time(t, time_format):
+            dt = datetime.fromisoformat(t)
+        elif parser is not None:
+            dt = parser(t)
+        else:
+            dt = datetime.strptime(t, time_format)
+        t_ = int(dt.timestamp()) * 1000 # Want milliseonds
         return t_
     except Exception as e:
         if t.endswith(' 00:00:00'):
@@ -144,12 +356,113 @@ def format_time(t: str, time_format: str, validate: bool = True) -> int:
             # date_parser function that doesn't parse diddly/squat to
             # pandas.read_excel() in process().
             return format_time(t.replace(' 00:00:00', ''), time_format, validate)
-        print(e)
+        logger.debug("format_time: %s", e)
         if validate:
             raise Exception(e)
         else:
             return None
 
+def format_time_series(s: pd.Series, time_format: str, validate: bool = True) -> pd.Series:
+    """
+    Description
+    -----------
+    Vectorized format_time: converts a series of time features into epoch
+    time (milliseconds) using `time_format`, a strftime definition. Values are
+    parsed by pandas.to_datetime in one pass instead of calling
+    datetime.strptime per value, and timestamp() is called once per distinct
+    time; see _epoch_ms.
+
+    Parameters
+    ----------
+    s: pd.Series
+        the time values; they are cast to str before parsing
+    time_format: str
+        the strftime format for the values in s
+    validate: bool, default True
+        whether to error check the time values. If set to False, then no error
+        is raised if a date fails to parse, but NaN is returned for it.
+
+    Returns
+    -------
+    pd.Series: int64 epoch times, or float64 with NaN where parsing failed.
+
+    Examples
+    --------
+
+    >>> df['date'] = format_time_series(df['date'], '%m/%d/%y %H:%M')
+    """
+    t = s.astype(str)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        # Already parsed, e.g. by pandas.read_excel; skip the str round trip.
+        return _epoch_ms(s, t, time_format, validate)
+
+    try:
+        dt = pd.to_datetime(t, format=time_format, errors="coerce")
+    except (ValueError, TypeError):
+        # Formats pandas cannot parse in bulk fall back to format_time.
+        return s.apply(lambda x: format_time(str(x), time_format, validate=validate))
+
+    # Retry values read by pandas.read_excel as a Timestamp; see format_time.
+    retry = dt.isna() & t.str.endswith(" 00:00:00")
+    if retry.any():
+        dt[retry] = pd.to_datetime(t[retry].str[:-len(" 00:00:00")], format=time_format, errors="coerce")
+
+    return _epoch_ms(dt, t, time_format, validate)
+
+def _epoch_ms(dt: pd.Series, t: pd.Series, time_format: str, validate: bool) -> pd.Series:
+    """
+    Description
+    -----------
+    Whole-second epoch times in milliseconds of the parsed times dt, exactly
+    as format_time computes them. datetime.timestamp() reads naive times with
+    the host's timezone rules, DST changes and historical offsets included,
+    so it is called once per distinct time rather than reimplemented.
+
+    Values that did not parse, or whose year is outside datetime's range
+    (e.g. negative years), are converted by format_time row by row. It
+    raises for them (validate) or returns None, so these rows give the same
+    result as the per-value conversion.
+
+    Parameters
+    ----------
+    dt: pd.Series
+        the parsed times; NaT where parsing failed
+    t: pd.Series
+        the time strings dt was parsed from
+    time_format: str
+        the strftime format for the values in t
+    validate: bool
+        whether to raise for time strings that fail to convert
+
+    Returns
+    -------
+    pd.Series: int64 epoch times, or float64 with NaN where conversion failed.
+    """
+    dt = dt.where(dt.dt.year.between(1, 9999))
+
+    codes, uniques = pd.factorize(dt)
+    epochs = np.full(len(uniques) + 1, np.nan)
+    for i, d in enumerate(uniques.to_pydatetime()):
+        try:
+            epochs[i] = int(d.timestamp()) * 1000
+        except (OverflowError, OSError, ValueError):
+            # e.g. 0001-01-01 is out of range once moved to local time.
+            pass
+
+    # NaT has code -1, which picks the trailing NaN.
+    epoch = pd.Series(epochs[codes], index=dt.index)
+
+    missing = epoch.isna()
+    if missing.any():
+        epoch[missing] = t[missing].apply(
+            lambda x: format_time(str(x), time_format, validate=validate)
+        ).astype(float)
+
+    if not epoch.isna().any():
+        epoch = epoch.astype("int64")
+
+    return epoch
+
 def geocode(
     admin: str, df: pd.DataFrame, x: str = "longitude", y: str = "latitude", gadm: gpd.GeoDataFrame = None,
     df_geocode: pd.DataFrame = pd.DataFrame()
@@ -253,11 +566,12 @@ def geocode(
         # dr_drop_dup_geo contains x,y not in df_geocode; so, these need to be
         # geocoded and added to the df_geocode library.
 
-        # 3) Apply Point() to create the geometry col.
-        df_drop_dup_geo.loc[:, "geometry"] = df_drop_dup_geo.apply(lambda row: Point(row[x], row[y]), axis=1) 
-
+        # 3) Create the geometry col from the x,y arrays in one vectorized call.
         # 4) Sjoin unique geometries with GADM.
-        gdf = gpd.GeoDataFrame(df_drop_dup_geo)
+        gdf = gpd.GeoDataFrame(
+            df_drop_dup_geo,
+            geometry=gpd.points_from_xy(df_drop_dup_geo[x], df_drop_dup_geo[y])
+        )
         
         # Spatial merge on GADM to obtain admin areas.
         gdf = gpd.sjoin(gdf, gadm, how="left", op="within", lsuffix="mixmasta_left", rsuffix="mixmasta_geocoded")
@@ -266,7 +580,7 @@ def geocode(
 
         # 5) Add the new geocoding to the df_geocode lat/long geocode library.
         if not df_geocode.empty:
-            df_geocode = df_geocode.append(gdf)
+            df_geocode = pd.concat([df_geocode, gdf])
         else:
             df_geocode = gdf
 
@@ -292,7 +606,7 @@ def generate_column_name(field_list: list) -> str:
     """
     return ''.join(sorted(field_list))
 
-def generate_timestamp_column(df: pd.DataFrame, date_mapper: dict, column_name: str) -> pd.DataFrame:
+def generate_timestamp_column(df: pd.DataFrame, date_mapper, column_name: str) -> pd.DataFrame:
     """
     Description
     -----------
@@ -304,10 +618,9 @@ def generate_timestamp_column(df: pd.DataFrame, date_mapper: dict, column_name:
     ----------
     df: pd.DataFrame
         our data
-    date_mapper: dict
+    date_mapper: dict or DateMapperView
         a schema mapping (JSON) for the dataframe filtered for "date_type" equal to
-        Day, Month, or Year. The format is screwy for our purposes here and could
-        be reafactored.
+        Day, Month, or Year, or the DateMapperView already parsed from it.
     column_name: str
         name of the new column e.g. timestamp for primary_time, year1month1day1
         for a concatneated name from associated date fields.
@@ -320,55 +633,29 @@ def generate_timestamp_column(df: pd.DataFrame, date_mapper: dict, column_name:
     """
 
     # Identify which date values are passed.
-    dayCol = None
-    monthCol = None
-    yearCol = None
-
-    for kk, vv in date_mapper.items():
-        if vv and vv["date_type"] == "day":
-            dayCol = kk
-        elif vv and vv["date_type"] == "month":
-           monthCol = kk
-        elif vv and vv["date_type"] == "year":
-            yearCol = kk
-
-    # For missing date values, add a column to the dataframe with the default
-    # value, then assign that to the day/month/year var. If the dataframe has
-    # the date value, assign day/month/year to it after casting as a str.
-    if dayCol:
-        day = df[dayCol].astype(str)
-    else:
-       df.loc[:, 'day_generate_timestamp_column'] = "1"
-       day = df['day_generate_timestamp_column']
-
-    if monthCol:
-        month = df[monthCol].astype(str)
-    else:
-       df.loc[:, 'month_generate_timestamp_column'] = "1"
-       month = df['month_generate_timestamp_column']
-
-    if yearCol:
-        year = df[yearCol].astype(str)
-    else:
-        df.loc[:, 'year_generate_timestamp_column'] = "01"
-        year = df['year_generate_timestamp_column']
-
-    # Add the new column
-    df.loc[:, column_name] = month + '/' + day + '/' + year
-
-    # Delete the temporary columns
-    if not dayCol:
-        del(df['day_generate_timestamp_column'])
-
-    if not monthCol:
-        del(df['month_generate_timestamp_column'])
-
-    if not yearCol:
-        del(df['year_generate_timestamp_column'])
+    if not isinstance(date_mapper, DateMapperView):
+        date_mapper = _parse_date_mapper(date_mapper)
+
+    dayCol = date_mapper.day_col
+    monthCol = date_mapper.month_col
+    yearCol = date_mapper.year_col
+
+    # Cast the date values to fixed-width numpy str arrays. Missing date
+    # values stay scalar defaults, which np.char.add broadcasts, so no
+    # per-row array or dataframe column is allocated for them.
+    day = str_array(df[dayCol]) if dayCol else "1"
+    month = str_array(df[monthCol]) if monthCol else "1"
+    year = str_array(df[yearCol]) if yearCol else "01"
+
+    # Add the new column; np.char.add concatenates the unicode arrays in C
+    # instead of building temporary object Series.
+    timestamp = np.char.add(np.char.add(month, "/"), day)
+    timestamp = np.char.add(np.char.add(timestamp, "/"), year)
+    df.loc[:, column_name] = timestamp
 
     return df
 
-def generate_timestamp_format(date_mapper: dict) -> str:
+def generate_timestamp_format(date_mapper) -> str:
     """
     Description
     -----------
@@ -377,26 +664,32 @@ def generate_timestamp_format(date_mapper: dict) -> str:
 
     Parameters
     ----------
-    date_mapper: dict
+    date_mapper: dict or DateMapperView
         a dictionary for the schema mapping (JSON) for the dataframe filtered
-        for "date_type" equal to Day, Month, or Year.
+        for "date_type" equal to Day, Month, or Year, or the DateMapperView
+        already parsed from it.
 
     Output
     ------
     e.g. "%m/%d/%Y"
     """
+    if not isinstance(date_mapper, DateMapperView):
+        date_mapper = _parse_date_mapper(date_mapper)
 
-    day = "%d"
-    month = "%m"
-    year = "%y"
+    return _timestamp_format(date_mapper.day_fmt, date_mapper.month_fmt, date_mapper.year_fmt)
 
-    for kk, vv in date_mapper.items():
-        if vv["date_type"] == "day":
-            day = vv["time_format"]
-        elif vv["date_type"] == "month":
-            month = vv["time_format"]
-        elif vv["date_type"] == "year":
-            year = vv["time_format"]
+@functools.lru_cache(maxsize=None)
+def _timestamp_format(day: str, month: str, year: str) -> str:
+    """
+    Cached body of generate_timestamp_format; missing formats default to
+    "%d", "%m" and "%y".
+    """
+    if day is None:
+        day = "%d"
+    if month is None:
+        month = "%m"
+    if year is None:
+        year = "%y"
 
     return str.format("{}/{}/{}", month, day, year)
 
@@ -518,6 +811,36 @@ def handle_colname_collisions(df: pd.DataFrame, mapper: dict, protected_cols: li
 
     return df, mapper, renamed_col_dict
 
+def is_iso_time(t: str, time_format: str) -> bool:
+    """
+    Description
+    -----------
+    Whether t can be parsed with datetime.fromisoformat instead of strptime:
+    time_format is one of ISO_TIME_FORMATS and t has exactly its layout.
+    fromisoformat accepts more layouts than the strftime format does, so
+    anything else is left to the regular parser.
+
+    Parameters
+    ----------
+    t: str
+        the time string
+    time_format: str
+        the strftime format for the string t
+
+    Examples
+    --------
+
+    >>> is_iso_time('2021-03-26', '%Y-%m-%d')
+    True
+    """
+    size = ISO_TIME_FORMATS.get(time_format)
+    if size is None or len(t) != size or not t.isascii():
+        return False
+    # Digits at every position but the separators, which must match the format.
+    layout = time_format.replace("%Y", "0000").replace("%m", "00").replace("%d", "00")
+    layout = layout.replace("%H", "00").replace("%M", "00").replace("%S", "00")
+    return all(c.isdigit() if f == "0" else c == f for c, f in zip(t, layout))
+
 def match_geo_names(admin: str, df: pd.DataFrame, resolve_to_gadm_geotypes: list, gadm: gpd.GeoDataFrame = None) -> pd.DataFrame:
     """
     Assumption
@@ -542,7 +865,7 @@ def match_geo_names(admin: str, df: pd.DataFrame, resolve_to_gadm_geotypes: list
     A pandas.Dataframe produced by modifying the parameter df.
 
     """
-    print('geocoding ...')
+    logger.debug("geocoding ...")
     flag = speedups.available
     if flag == True:
         speedups.enable()
@@ -649,13 +972,40 @@ def netcdf2df(netcdf: str) -> pd.DataFrame:
     DataFrame
         The resultant dataframe
     """
-    try:        
-        ds = xr.open_dataset(netcdf)
-    except:
-        raise AssertionError(f"improperly formatted netCDF file ({netcdf})")
+    try:
+        # h5netcdf with dask chunks reads and decompresses variables in
+        # parallel; it needs h5netcdf and dask, and only reads NetCDF4/HDF5.
+        ds = xr.open_dataset(netcdf, engine="h5netcdf", chunks="auto")
+    except Exception:
+        try:
+            ds = xr.open_dataset(netcdf)
+        except:
+            raise AssertionError(f"improperly formatted netCDF file ({netcdf})")
 
-    data = ds.to_dataframe()
-    df = data.reset_index()
+    # Equivalent to ds.to_dataframe().reset_index(), but the dimension columns
+    # are broadcast instead of building and resetting a MultiIndex.
+    sizes = dict(ds.sizes)
+    dims = list(sizes)
+    shape = tuple(sizes.values())
+
+    if any(var.chunks for var in ds.variables.values()):
+        # Dask-backed: flatten the chunks in parallel and assemble once.
+        columns = dims + [k for k in ds.variables if k not in sizes]
+        ddf = ds.to_dask_dataframe(dim_order=dims)
+        df = ddf.compute(scheduler="threads")[columns].reset_index(drop=True)
+
+        return df
+
+    data = {}
+    for i, dim in enumerate(dims):
+        index = ds.get_index(dim).values
+        data[dim] = np.broadcast_to(index.reshape([-1 if j == i else 1 for j in range(len(dims))]), shape).ravel()
+
+    for k, var in ds.variables.items():
+        if k not in sizes:
+            data[k] = var.set_dims(sizes).values.ravel()
+
+    df = pd.DataFrame(data)
 
     return df
 
@@ -766,7 +1116,7 @@ def normalizer(df: pd.DataFrame, mapper: dict, admin: str, gadm: gpd.GeoDataFram
             # the loaded schema.
             if date_dict["date_type"] == "date":
                 # convert primary_time of date_type date to epochtime and rename as 'timestamp'
-                df.loc[:, kk] = df[kk].apply(lambda x: format_time(str(x), date_dict["time_format"], validate=False))
+                df.loc[:, kk] = format_time_series(df[kk], date_dict["time_format"], validate=False)
                 staple_col_name = "timestamp"
                 df.rename(columns={kk: staple_col_name}, inplace=True)
                 # renamed_col_dict[ staple_col_name ] = [kk] # 7/2/2021 do not include primary cols
@@ -781,7 +1131,7 @@ def normalizer(df: pd.DataFrame, mapper: dict, admin: str, gadm: gpd.GeoDataFram
         else:
             if date_dict["date_type"] == "date":
                 # Convert all date/time to epoch time if not already.
-                df.loc[:, kk] = df[kk].apply(lambda x: format_time(str(x), date_dict["time_format"], validate=False))
+                df.loc[:, kk] = format_time_series(df[kk], date_dict["time_format"], validate=False)
                 # If three are no assigned primary_time columns, make this the
                 # primary_time timestamp column, and keep as a feature so the
                 # column_name meaning is not lost.
@@ -823,19 +1173,16 @@ def normalizer(df: pd.DataFrame, mapper: dict, admin: str, gadm: gpd.GeoDataFram
         # These need to be combined
         # into a date and then epoch time, and added as the timestamp field.
 
-        # Create a separate df of the associated date fields. This avoids
-        # pandas upcasting the series dtypes on df.apply(); e.g., int to float,
-        # or a month 9 to 9.0, which breaks generate_timestamp()
-        assoc_fields = primary_date_group_mapper.keys()
-        date_df = df[ assoc_fields ]
+        # Parse the date group once for both helpers below.
+        date_view = _parse_date_mapper(primary_date_group_mapper)
 
-        # Now generate the timestamp from date_df and add timestamp col to df.
-        df = generate_timestamp_column(df, primary_date_group_mapper, "timestamp")
+        # Now generate the timestamp and add timestamp col to df.
+        df = generate_timestamp_column(df, date_view, "timestamp")
 
         # Determine the correct time format for the new date column, and
         # convert to epoch time.
-        time_formatter = generate_timestamp_format(primary_date_group_mapper)
-        df['timestamp'] = df["timestamp"].apply(lambda x: format_time(str(x), time_formatter, validate=False))
+        time_formatter = generate_timestamp_format(date_view)
+        df['timestamp'] = format_time_series(df["timestamp"], time_formatter, validate=False)
 
         # Let SpaceTag know those date columns were renamed to timestamp.
         #renamed_col_dict[ "timestamp" ] = assoc_fields # 7/2/2021 do not include primary cols
@@ -879,21 +1226,18 @@ def normalizer(df: pd.DataFrame, mapper: dict, admin: str, gadm: gpd.GeoDataFram
         else:
             new_column_name = generate_column_name(assoc_fields)
 
-        # Create a separate df of the associated date fields. This avoids
-        # pandas upcasting the series dtypes on df.apply(); e.g., int to float,
-        # or a month 9 to 9.0, which breaks generate_timestamp()
-        date_df = df[ assoc_fields ]
+        # Parse the date group once for both helpers below.
+        date_view = _parse_date_mapper(assoc_columns_dict)
 
-        # Now generate the timestamp from date_df and add timestamp col to df.
-        df = generate_timestamp_column(df, assoc_columns_dict, new_column_name)
+        # Now generate the timestamp and add timestamp col to df.
+        df = generate_timestamp_column(df, date_view, new_column_name)
 
         # Determine the correct time format for the new date column, and
         # convert to epoch time only if all three date components (day, month,
         # year) are present; otherwise leave as a date string.
-        date_types = [v["date_type"] for k,v in assoc_columns_dict.items()]
-        if len(frozenset(date_types).intersection(MONTH_DAY_YEAR)) == 3:
-            time_formatter = generate_timestamp_format(assoc_columns_dict)
-            df.loc[:, new_column_name] = df[new_column_name].apply(lambda x: format_time(str(x), time_formatter, validate=False))
+        if None not in (date_view.day_col, date_view.month_col, date_view.year_col):
+            time_formatter = generate_timestamp_format(date_view)
+            df.loc[:, new_column_name] = format_time_series(df[new_column_name], time_formatter, validate=False)
 
         # Let SpaceTag know those date columns were renamed to a new column.
         renamed_col_dict[ new_column_name] = assoc_fields
@@ -1108,7 +1452,9 @@ def normalizer(df: pd.DataFrame, mapper: dict, admin: str, gadm: gpd.GeoDataFram
     if not features:
         df_out = df[protected_cols]
     else:
-        df_out = pd.DataFrame()
+        # Collect the per-feature frames and concatenate them once; appending
+        # in the loop copied the accumulated output for every feature.
+        feature_dfs = []
         for feat in features:
             using_cols = protected_cols.copy()
 
@@ -1143,16 +1489,19 @@ def normalizer(df: pd.DataFrame, mapper: dict, admin: str, gadm: gpd.GeoDataFram
 
             # Add feature/value for epochtime as object adds it without decimal
             # places, but it is still saved as a double in the parquet file.
-            if len(df_out) == 0:
-                if feat in other_time_cols:
-                    df_out = df_.astype({'value': object})
-                else:
-                    df_out = df_
+            if feat in other_time_cols:
+                feature_dfs.append(df_.astype({'value': object}))
             else:
-                if feat in other_time_cols:
-                    df_out = df_out.append(df_.astype({'value': object}))
-                else:
-                    df_out = df_out.append(df_)
+                feature_dfs.append(df_)
+
+        # Skip leading empty frames so they do not set the output columns or dtypes.
+        while len(feature_dfs) > 1 and len(feature_dfs[0]) == 0:
+            feature_dfs.pop(0)
+
+        if len(feature_dfs) == 1:
+            df_out = feature_dfs[0]
+        else:
+            df_out = pd.concat(feature_dfs)
 
     for c in col_order:
         if c not in df_out:
@@ -1191,7 +1540,17 @@ def optimize_df_types(df: pd.DataFrame):
 
     return df
 
-def process(fp: str, mp: str, admin: str, output_file: str, write_output = True, gadm=None):
+def parquet_suffix(compression: str) -> str:
+    """
+    Description
+    -----------
+    The file suffix for parquet output written with the given compression
+    codec. gzip keeps the historical .parquet.gzip suffix; every other codec
+    (or None) writes a plain .parquet file.
+    """
+    return ".parquet.gzip" if compression == "gzip" else ".parquet"
+
+def process(fp: str, mp: str, admin: str, output_file: str, write_output = True, gadm=None, compression: str = "gzip"):
     """
     Parameters
     ----------
@@ -1203,6 +1562,10 @@ def process(fp: str, mp: str, admin: str, output_file: str, write_output = True,
     gadm: gpd.GeoDataFrame, default None
         optional specification of a GeoDataFrame of GADM shapes of the appropriate
         level (admin2/3) for geocoding
+
+    compression: str, default gzip
+        parquet compression codec for the output files, or None for
+        uncompressed; see parquet_suffix for the file names.
     """
 
     # Read JSON schema to be mapper.
@@ -1237,7 +1600,7 @@ def process(fp: str, mp: str, admin: str, output_file: str, write_output = True,
     elif ftype != "csv":
         df = netcdf2df(fp)
     else:
-        df = pd.read_csv(fp)
+        df = csv2df(fp, mapper)
 
     ## Make mapper contain only keys for date, geo, and feature.
     mapper = { k: mapper[k] for k in mapper.keys() & {"date", "geo", "feature"} }
@@ -1270,18 +1633,19 @@ def process(fp: str, mp: str, admin: str, output_file: str, write_output = True,
         # This is predicated on the assumption that qualifying feature columns
         # are of a single dtype.
 
-        norm['type'] = norm[['value']].applymap(type)
+        norm['type'] = norm['value'].map(type)
         norm_str = norm[norm['type']==str]
         norm = norm[norm['type']!=str]
         del(norm_str['type'])
         del(norm['type'])
 
         # Write parquet files
-        norm.to_parquet(f"{output_file}.parquet.gzip", compression="gzip")
+        suffix = parquet_suffix(compression)
+        norm.to_parquet(f"{output_file}{suffix}", compression=compression)
         if len(norm_str) > 0:
-            norm_str.to_parquet(f"{output_file}_str.parquet.gzip", compression="gzip")
+            norm_str.to_parquet(f"{output_file}_str{suffix}", compression=compression)
 
-        norm = norm.append(norm_str)
+        norm = pd.concat([norm, norm_str])
 
     # Reduce memory size of returned dataframe.
     norm = optimize_df_types(norm)
@@ -1289,15 +1653,264 @@ def process(fp: str, mp: str, admin: str, output_file: str, write_output = True,
 
     return norm, renamed_col_dict
 
+@functools.lru_cache(maxsize=32)
+def _raster_coords(geotrans: tuple, xsize: int, ysize: int) -> (np.ndarray, np.ndarray):
+    """
+    Description
+    -----------
+    Longitude of each raster column and latitude of each raster row, taken at
+    the centre of the cell. Cached so the bands of a raster, and rasters
+    sharing a grid, compute them once; the arrays are read-only.
+
+    Parameters
+    ----------
+    geotrans: tuple
+        the GDAL geotransform of the raster
+    xsize: int
+        the number of columns
+    ysize: int
+        the number of rows
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray): the column longitudes and the row latitudes.
+    """
+    # specify the center offset (takes the point in middle of pixel)
+    HalfX = geotrans[1] / 2
+    HalfY = geotrans[5] / 2
+
+    # Upper left of each cell, offset by half a cell to get the centre.
+    # Y is negative so it's a minus.
+    X = geotrans[0] + (np.arange(xsize) * geotrans[1]) + HalfX
+    Y = geotrans[3] + (np.arange(ysize) * geotrans[5]) + HalfY
+    X.flags.writeable = False
+    Y.flags.writeable = False
+
+    return X, Y
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _valid_pixels_numba(arr, nodata):
+        """
+        Numba version of the valid pixel selection in _read_valid_pixels.
+        Counts the pixels greater than nodata per row, then fills the
+        row-major output in parallel; NaN never compares greater.
+        """
+        nrows, ncols = arr.shape
+        counts = np.zeros(nrows, np.int64)
+        for i in prange(nrows):
+            n = 0
+            for j in range(ncols):
+                if arr[i, j] > nodata:
+                    n += 1
+            counts[i] = n
+
+        offsets = np.zeros(nrows + 1, np.int64)
+        offsets[1:] = np.cumsum(counts)
+        rows = np.empty(offsets[nrows], np.int64)
+        cols = np.empty(offsets[nrows], np.int64)
+        values = np.empty(offsets[nrows], arr.dtype)
+        for i in prange(nrows):
+            k = offsets[i]
+            for j in range(ncols):
+                if arr[i, j] > nodata:
+                    rows[k] = i
+                    cols[k] = j
+                    values[k] = arr[i, j]
+                    k += 1
+
+        return rows, cols, values
+
+    _valid_pixels_kernel = _valid_pixels_numba
+else:
+    _valid_pixels_numba = None
+    _valid_pixels_kernel = None
+
+try:
+    # Prefer the compiled Cython kernel when the package was built with it.
+    from ._raster_kernel import valid_pixels as _valid_pixels_kernel
+except ImportError:
+    pass
+
+def _open_raster(InRaster: Union[str, gdal.Dataset]) -> gdal.Dataset:
+    """
+    The dataset of a raster path, opened shared and read-only, or InRaster
+    itself when the caller has already opened it e.g. to convert several of
+    its bands without reopening the file.
+    """
+    if isinstance(InRaster, gdal.Dataset):
+        return InRaster
+    return gdal.OpenShared(InRaster, gdalconst.GA_ReadOnly)
+
+def _band_nodata(rBand, nodataval):
+    """
+    Description
+    -----------
+    The nodata value of a raster band, or nodataval if the band has none,
+    cast to the band's float type so comparisons with its pixels are exact.
+
+    Parameters
+    ----------
+    rBand: gdal.Band
+        the raster band
+    nodataval: int
+        the value for no data pixels if the band does not define one
+    """
+    nData = rBand.GetNoDataValue()
+
+    if nData == None:
+        logging.warning(f"No nodataval found, setting to {nodataval}")
+        nData = np.float32(nodataval)  # set it to something if not set
+    else:
+        logging.info(f"Nodataval is: {nData} type is : {type(nData)}")
+
+    # Check that NoDataValue is of the same type as the raster data; the
+    # band's numpy type comes from its GDAL type without reading pixels.
+    band_data_type = gdal_array.GDALTypeCodeToNumericTypeCode(rBand.DataType)
+    if type(nData) != band_data_type:
+        logging.info(
+            f"NoData type mismatch: NoDataValue is type {type(nData)} and raster data is type {band_data_type}"
+        )
+        # e.g. NoDataValue is type <class 'float'> and raster data is type <class 'numpy.float32'>
+        # Fix float type mismatches so comparison works below (value > nData)
+        if band_data_type == np.float32:
+            nData = np.float32(nData)
+        elif band_data_type == np.float64:
+            nData = np.float64(nData)
+        elif band_data_type == np.float16:
+            nData = np.float16(nData)
+
+    return nData
+
+def _band_value(x: int, band: int, bands: dict, band_name: str):
+    """
+    Description
+    -----------
+    Band selection shared by raster2df and raster2parquet: the name of
+    raster band x, or None if the band is skipped.
+
+    Parameters
+    ----------
+    x: int
+        the 1-based band number
+    band: int
+        if greater than 0, the only band to process
+    bands: dict
+        the band identifiers from the meta; only the listed bands are
+        processed and each is named by its entry
+    band_name: str
+        the name of the band of a single-band raster (no bands)
+
+    Returns
+    -------
+    str: the band name, or None if the band is skipped.
+    """
+    # If band has a value, then limit import to the single specified band.
+    if band > 0 and band != x:
+        return None
+
+    # If no bands in meta, then single-band and use band_name
+    # If bands, then process only those in the meta.
+    if not bands:
+        logging.info(f"Single band detected. Bands: {bands}, band_name: {band_name}")
+        return band_name
+    elif str(x) in bands:
+        logging.info(f"Multi-band detected Bands: {bands}, band_name: {band_name}")
+        return bands[str(x)]
+
+    # Processing a band not specified in the meta, so skip it
+    logging.info(f"Skipping band {x} since it is not specified in {bands}.")
+    return None
+
+def _read_valid_pixels(rBand, nData, xsize: int, ysize: int) -> (np.ndarray, np.ndarray, np.ndarray):
+    """
+    Description
+    -----------
+    The valid pixels of a whole raster band; see _iter_valid_pixels.
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray, np.ndarray): the row, column and value of each
+    valid pixel in row-major order; the values keep the band's dtype.
+    """
+    rows, cols, values = zip(*_iter_valid_pixels(rBand, nData, xsize, ysize))
+
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+
+def _iter_valid_pixels(rBand, nData, xsize: int, ysize: int):
+    """
+    Description
+    -----------
+    Read a raster band in full-width windows of whole blocks, at most
+    RASTER_WINDOW_PIXELS pixels each, and select the valid pixels of each
+    window in a vectorized pass. Windows follow the on-disk layout so GDAL
+    streams blocks instead of holding the whole band in memory. The next
+    window is read in a background thread while the current one is masked.
+
+    Parameters
+    ----------
+    rBand: gdal.Band
+        the raster band
+    nData: number
+        the nodata value; only pixels greater than it are kept
+    xsize: int
+        the number of columns
+    ysize: int
+        the number of rows
+
+    Yields
+    ------
+    (np.ndarray, np.ndarray, np.ndarray): per window, the row, column and
+    value of each valid pixel in row-major order; the values keep the band's
+    dtype.
+    """
+    block_height = rBand.GetBlockSize()[1]
+    height = max(1, RASTER_WINDOW_PIXELS // (xsize * block_height)) * block_height
+
+    windows = [(yoff, min(height, ysize - yoff)) for yoff in range(0, ysize, height)]
+
+    def read(window):
+        return rBand.ReadAsArray(0, window[0], xsize, window[1])
+
+    # Mask buffer reused by every window on the numpy path.
+    mask_buffer = None
+
+    # A single reader thread, so the band is only ever used by one thread.
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        pending = reader.submit(read, windows[0])
+        for i, (yoff, _) in enumerate(windows):
+            BandData = pending.result()
+            if i + 1 < len(windows):
+                pending = reader.submit(read, windows[i + 1])
+
+            kernel_dtype = BandData.dtype.kind in "iu" or BandData.dtype in (np.float32, np.float64)
+            if _valid_pixels_kernel is not None and kernel_dtype:
+                # Fused pass over the window with the Cython or numba kernel.
+                window_rows, window_cols, window_values = _valid_pixels_kernel(BandData, np.float64(nData))
+            else:
+                # NaN never compares greater than nData, so NaN pixels are excluded
+                # without an isnan pass, for float and integer bands alike.
+                # TODO: implement filters on valid pixels
+                # for example, the below would ensure pixel values are between -100 and 100
+                # mask &= (BandData <= 100) & (BandData >= -100)
+                if mask_buffer is None:
+                    mask_buffer = np.empty((min(height, ysize), xsize), dtype=bool)
+                mask = np.greater(BandData, nData, out=mask_buffer[:len(BandData)])
+                window_rows, window_cols = np.nonzero(mask)
+                window_values = BandData[mask]
+
+            yield window_rows + yoff, window_cols, window_values
+
 def raster2df(
-    InRaster: str,
+    InRaster: Union[str, gdal.Dataset],
     feature_name: str = "feature",
     band: int = 0,
     nodataval: int = -9999,
     date: str = None,
     band_name: str = "feature2",
     bands: dict = None,
-    band_type: str = 'category'
+    band_type: str = 'category',
+    coord_dtype: type = np.float64
 
 ) -> pd.DataFrame:
     """
@@ -1307,8 +1920,8 @@ def raster2df(
 
     Parameters
     ----------
-    InRaster: str
-        the path of the input raster file
+    InRaster: str or gdal.Dataset
+        the path of the input raster file, or the already opened raster
     feature_name: str
         the name of the feature represented by the pixel values
     band: int, default 1
@@ -1324,6 +1937,9 @@ def raster2df(
         be processed.
     band_type: str, default category
         Specifies band type e.g. category or datetime. If datetime, this data goes into the date column.
+    coord_dtype: type, default np.float64
+        dtype of the longitude and latitude columns; np.float32 halves their
+        memory. Pixel values always keep the band's dtype.
 
     Examples
     --------
@@ -1332,36 +1948,26 @@ def raster2df(
     >>> df = raster2df('path_to_raster.geotiff', 'rainfall', band=1)
 
     """
+    # Let GDAL decompress tiles on all cores (GDAL >= 3.6) unless the caller
+    # has configured GDAL_NUM_THREADS; the option is process wide.
+    if gdal.GetConfigOption("GDAL_NUM_THREADS") is None:
+        gdal.SetConfigOption("GDAL_NUM_THREADS", "ALL_CPUS")
+
     # open the raster and get some properties
-    ds = gdal.OpenShared(InRaster, gdalconst.GA_ReadOnly)
+    ds = _open_raster(InRaster)
     GeoTrans = ds.GetGeoTransform()
-    ColRange = range(ds.RasterXSize)
-    RowRange = range(ds.RasterYSize)
+    ColX, RowY = _raster_coords(tuple(GeoTrans), ds.RasterXSize, ds.RasterYSize)
 
-    # Cache the dataframe and value data type.
+    # Cache the dataframe. Bands that are stacked rather than merged are
+    # collected and concatenated once after the loop.
     df = pd.DataFrame()
-    row_data_type = None
+    band_dfs = []
     
     for x in range(1, ds.RasterCount+1):
-        # If band has a value, then limit import to the single specified band.
-        if band > 0 and band != x:
+        band_value = _band_value(x, band, bands, band_name)
+        if band_value is None:
             continue
 
-        # If no bands in meta, then single-band and use band_name
-        # If bands, then process only those in the meta.
-        if not bands:
-            band_value = band_name
-            logging.info(f"Single band detected. Bands: {bands}, band_name: {band_name}, feature_name: {feature_name}")
-        elif str(x) in bands:
-            band_value = bands[str(x)]
-            logging.info(f"Multi-band detected Bands: {bands}, band_name: {band_name}, feature_name: {feature_name}")
-        elif str(x) not in bands:
-            # Processing a band not specified in the meta, so skip it
-            logging.info(f"Skipping band {x} since it is not specified in {bands}.")
-            continue
-        else:
-            raise Exception(f"Neither single nor multiple bands specified in meta. Current band: {x}, Bands: {bands}, band_name: {band_name}, feature_name: {feature_name}")
-
         # Create columns for the dataframe.
         if not bands:
             columns = ["longitude", "latitude", feature_name]
@@ -1377,74 +1983,30 @@ def raster2df(
             raise Exception(f"During column processing, neither single nor multiple bands specified in meta. Bands: {bands}, band_name: {band_name}, feature_name: {feature_name}")
                 
         rBand = ds.GetRasterBand(x)  
-        nData = rBand.GetNoDataValue()
-
-        if nData == None:
-            logging.warning(f"No nodataval found, setting to {nodataval}")
-            nData = np.float32(nodataval)  # set it to something if not set
-        else:
-            logging.info(f"Nodataval is: {nData} type is : {type(nData)}")
-
-        # specify the center offset (takes the point in middle of pixel)
-        HalfX = GeoTrans[1] / 2
-        HalfY = GeoTrans[5] / 2
-
-        # Check that NoDataValue is of the same type as the raster data
-        RowData = rBand.ReadAsArray(0, 0, ds.RasterXSize, 1)[0]
-        row_data_type = type(RowData[0])
-        if type(nData) != row_data_type:
-            logging.info(
-                f"NoData type mismatch: NoDataValue is type {type(nData)} and raster data is type {row_data_type}"
-            )
-            # e.g. NoDataValue is type <class 'float'> and raster data is type <class 'numpy.float32'>
-            # Fix float type mismatches so comparison works below (row_value != nData)
-            if row_data_type == np.float32:
-                nData = np.float32(nData)
-            elif row_data_type == np.float64:
-                nData = np.float64(nData)
-            elif row_data_type == np.float16:
-                nData = np.float16(nData)
-
-        points = []
-      
-        for ThisRow in RowRange:
-            RowData = rBand.ReadAsArray(0, ThisRow, ds.RasterXSize, 1)[0]
-            for ThisCol in ColRange:
-                # need to exclude NaN values since there is no nodataval
-                row_value = RowData[ThisCol]
-
-                if (row_value > nData) and not (np.isnan(row_value)):
-
-                    # TODO: implement filters on valid pixels
-                    # for example, the below would ensure pixel values are between -100 and 100
-                    # if (RowData[ThisCol] <= 100) and (RowData[ThisCol] >= -100):
-
-                    X = GeoTrans[0] + (ThisCol * GeoTrans[1])
-                    Y = GeoTrans[3] + (ThisRow * GeoTrans[5])  # Y is negative so it's a minus
-                    # this gives the upper left of the cell, offset by half a cell to get centre
-                    X += HalfX
-                    Y += HalfY
-
-                    # Add the data row to the dataframe.
-                    if bands == None:
-                        points.append([X, Y, row_value])
-                    elif band_type == 'datetime':
-                        points.append([X, Y, band_value, row_value])
-                    else:
-                        points.append([X, Y, row_value])
-
-        # This will make all floats float64, but will be optimized in process().
-        new_df = pd.DataFrame(points, columns=columns)
-
-        if df.empty:
+        nData = _band_nodata(rBand, nodataval)
+
+        rows, cols, values = _read_valid_pixels(rBand, nData, ds.RasterXSize, ds.RasterYSize)
+        X = ColX[cols].astype(coord_dtype, copy=False)
+        Y = RowY[rows].astype(coord_dtype, copy=False)
+
+        # Build the band dataframe from the column arrays; the values keep the
+        # band's dtype.
+        data = {"longitude": X, "latitude": Y}
+        if bands and band_type == 'datetime':
+            data["date"] = band_value
+        data[columns[-1]] = values
+        new_df = pd.DataFrame(data, columns=columns)
+
+        if not (bands and band_type != 'datetime'):
+            band_dfs.append(new_df)
+        elif df.empty:
             df = new_df
         else:
-            #df = df.merge(new_df, left_on=["longitude", "latitude"], right_on=["longitude", "latitude"])
-            if (bands and band_type != 'datetime'):
-                #df.join(new_df, on=["longitude", "latitude"])
-                df = df.merge(new_df, left_on=["longitude", "latitude"], right_on=["longitude", "latitude"])
-            else:
-                df = df.append(new_df)
+            #df.join(new_df, on=["longitude", "latitude"])
+            df = df.merge(new_df, left_on=["longitude", "latitude"], right_on=["longitude", "latitude"])
+
+    if band_dfs:
+        df = pd.concat(band_dfs)
 
     # Add the date from the mapper.
     if (date and band_type != 'datetime'):
@@ -1454,6 +2016,170 @@ def raster2df(
 
     return df
 
+def _raster2df_task(raster) -> pd.DataFrame:
+    """
+    raster2df of a path, or with keyword arguments from a dict; module level
+    so it can be pickled to a worker process.
+    """
+    if isinstance(raster, dict):
+        return raster2df(**raster)
+    return raster2df(raster)
+
+def raster2df_multi(rasters: list, max_workers: int = None) -> pd.DataFrame:
+    """
+    Description
+    -----------
+    Run raster2df over several rasters (or bands of a raster) in a process
+    pool and concatenate the results once, with a new index. GDAL is not
+    safe to share across threads, so each task opens its own dataset in a
+    worker process.
+
+    Parameters
+    ----------
+    rasters: list
+        raster paths converted with the raster2df defaults, or dicts of the
+        keyword arguments of each raster2df call e.g.
+        [{"InRaster": "a.tif", "band": 1}, {"InRaster": "a.tif", "band": 2}]
+    max_workers: int, default None
+        the number of worker processes; defaults to the number of CPUs.
+
+    Examples
+    --------
+
+    >>> df = raster2df_multi([{"InRaster": "2019.tif", "feature_name": "rainfall", "date": "2019-01-01"},
+    ...                       {"InRaster": "2020.tif", "feature_name": "rainfall", "date": "2020-01-01"}])
+
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        dfs = list(executor.map(_raster2df_task, rasters))
+
+    return pd.concat(dfs, ignore_index=True)
+
+def raster2parquet(
+    InRaster: Union[str, gdal.Dataset],
+    output_file: str,
+    feature_name: str = "feature",
+    band: int = 0,
+    nodataval: int = -9999,
+    date: str = None,
+    band_name: str = "feature2",
+    bands: dict = None,
+    band_type: str = 'category',
+    coord_dtype: type = np.float64,
+    compression: str = "gzip"
+) -> int:
+    """
+    Description
+    -----------
+    Streaming raster2df: converts a raster (.tiff) file to a parquet file one
+    raster window at a time, so memory is bounded by a window instead of the
+    whole output. Rows are written in band and pixel order rather than
+    sorted. Categorical multi-band rasters are merged on their coordinates,
+    which needs the whole frame, so those must use raster2df.
+
+    Parameters
+    ----------
+    InRaster: str or gdal.Dataset
+        the path of the input raster file, or the already opened raster
+    output_file: str
+        the path of the parquet file to write
+    compression: str, default gzip
+        the parquet compression codec
+
+    See raster2df for the remaining parameters.
+
+    Returns
+    -------
+    int: the number of rows written.
+
+    Examples
+    --------
+
+    >>> n = raster2parquet('path_to_raster.geotiff', 'rainfall.parquet.gzip', 'rainfall', band=1)
+
+    """
+    if bands and band_type != 'datetime':
+        raise Exception(f"raster2parquet cannot stream categorical multi-band rasters; use raster2df. Bands: {bands}")
+
+    if gdal.GetConfigOption("GDAL_NUM_THREADS") is None:
+        gdal.SetConfigOption("GDAL_NUM_THREADS", "ALL_CPUS")
+
+    ds = _open_raster(InRaster)
+    ColX, RowY = _raster_coords(tuple(ds.GetGeoTransform()), ds.RasterXSize, ds.RasterYSize)
+
+    selected = []
+    for x in range(1, ds.RasterCount+1):
+        band_value = _band_value(x, band, bands, band_name)
+        if band_value is not None:
+            selected.append((x, band_value))
+
+    # The schema is fixed before any pixels are read, so bands of different
+    # dtypes (e.g. an int band then a float band) share the promoted value
+    # type, as in the concatenated raster2df frame, and a raster without
+    # valid pixels still gets a file with the expected columns.
+    band_dtypes = [gdal_array.GDALTypeCodeToNumericTypeCode(ds.GetRasterBand(x).DataType) for x, _ in selected]
+    value_dtype = np.result_type(*band_dtypes) if band_dtypes else np.float64
+
+    fields = [
+        ("longitude", pa.from_numpy_dtype(np.dtype(coord_dtype))),
+        ("latitude", pa.from_numpy_dtype(np.dtype(coord_dtype))),
+    ]
+    if bands:
+        fields.append(("date", pa.string()))
+    fields.append((feature_name, pa.from_numpy_dtype(value_dtype)))
+    if date and band_type != 'datetime':
+        fields.append(("date", pa.string()))
+    schema = pa.schema(fields)
+
+    count = 0
+    writer = pq.ParquetWriter(output_file, schema, compression=compression)
+    try:
+        for x, band_value in selected:
+            rBand = ds.GetRasterBand(x)
+            nData = _band_nodata(rBand, nodataval)
+
+            for rows, cols, values in _iter_valid_pixels(rBand, nData, ds.RasterXSize, ds.RasterYSize):
+                data = {
+                    "longitude": ColX[cols].astype(coord_dtype, copy=False),
+                    "latitude": RowY[rows].astype(coord_dtype, copy=False),
+                }
+                if bands:
+                    data["date"] = pa.repeat(str(band_value), len(values))
+                data[feature_name] = values.astype(value_dtype, copy=False)
+                if date and band_type != 'datetime':
+                    data["date"] = pa.repeat(str(date), len(values))
+
+                writer.write_table(pa.Table.from_pydict(data, schema=schema))
+                count += len(values)
+
+        if not count:
+            writer.write_table(schema.empty_table())
+    finally:
+        writer.close()
+
+    return count
+
+def str_array(series: pd.Series) -> np.ndarray:
+    """
+    Description
+    -----------
+    Cast a series to a numpy unicode array, matching series.astype(str).
+    Numeric and bool dtypes are cast by numpy directly; anything else (e.g.
+    datetimes, categoricals) is formatted by pandas first.
+
+    Parameters
+    ----------
+    series: pd.Series
+        the column to cast
+
+    Returns
+    -------
+    np.ndarray: array of dtype str
+    """
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biuf":
+        return series.to_numpy().astype(str)
+    return series.astype(str).to_numpy(dtype=str)
+
 class mixdata:
     def load_gadm2(self):
         cdir = os.path.expanduser("~")
@@ -2,7 +2,13 @@
 
 """The setup script."""
 
-from setuptools import find_packages, setup
+from setuptools import Extension, find_packages, setup
+
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    # The compiled raster kernel is optional; mixmasta falls back to numpy.
+    cythonize = None
 
 
 def read_requirements(path: str):
@@ -18,6 +24,12 @@ with open("HISTORY.md") as history_file:
 
 install_requirements = read_requirements("requirements.txt")
 
+ext_modules = []
+if cythonize is not None:
+    ext_modules = cythonize(
+        [Extension("mixmasta._raster_kernel", ["mixmasta/_raster_kernel.pyx"])]
+    )
+
 setup(
     author="Brandon Rose",
     author_email="brandon@jataware.com",
@@ -34,6 +46,7 @@ setup(
         "Programming Language :: Python :: 3.8",
     ],
     description="A library for common scientific model transforms",
+    ext_modules=ext_modules,
     entry_points={
         "console_scripts": [
             "mixmasta=mixmasta.cli:cli",
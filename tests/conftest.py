@@ -0,0 +1,106 @@
+"""Shared fixtures for the `mixmasta` tests."""
+
+import copy
+import functools
+import json
+import os
+import pathlib
+
+import pandas as pd
+import pytest
+
+from mixmasta import mixmasta
+
+INPUTS = pathlib.Path(__file__).parent / "inputs"
+OUTPUTS = pathlib.Path(__file__).parent / "outputs"
+
+
+@pytest.fixture(scope="session")
+def processed(tmp_path_factory):
+    """
+    Run mixmasta.process on an input file and mapper in inputs/ once per
+    session. Returns copies, since the tests sort and cast the results.
+    """
+    results = {}
+
+    def process(fp: str, mp: str, geo: str = 'admin2'):
+        key = (fp, mp, geo)
+        if key not in results:
+            outf = tmp_path_factory.mktemp("outputs") / "unittests"
+            results[key] = mixmasta.process(str(INPUTS / fp), str(INPUTS / mp), geo, str(outf), compression='snappy')
+
+        df, dct = results[key]
+        return df.copy(), copy.deepcopy(dct)
+
+    return process
+
+
+def _load_expected(csv: str) -> pd.DataFrame:
+    """
+    Read an expected output CSV from outputs/ with mixmasta.csv2df (the
+    pyarrow parser where available) and optimize its types with
+    mixmasta.optimize_df_types. The optimized frame is cached beside the CSV
+    as feather and regenerated whenever the CSV is newer than the cache.
+    """
+    csv_path = OUTPUTS / csv
+    feather_path = csv_path.with_suffix('.feather')
+
+    if feather_path.exists() and feather_path.stat().st_mtime >= csv_path.stat().st_mtime:
+        return pd.read_feather(str(feather_path))
+
+    output_df = mixmasta.csv2df(str(csv_path))
+    output_df = mixmasta.optimize_df_types(output_df)
+
+    # Write to a temp file and rename so concurrent sessions never read a
+    # partial cache. Frames feather can't store (e.g. object columns of mixed
+    # types) are simply not cached.
+    tmp_path = feather_path.with_name(f'{feather_path.name}.{os.getpid()}.tmp')
+    try:
+        output_df.to_feather(str(tmp_path))
+        os.replace(tmp_path, feather_path)
+    except Exception:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    return output_df
+
+
+@functools.lru_cache(maxsize=None)
+def load_expected_dict(path: pathlib.Path) -> dict:
+    """
+    Parse an expected renamed column dictionary JSON file once per process.
+    Callers must not mutate the result; the expected_dict fixture deep
+    copies it.
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="session")
+def expected():
+    """
+    Load an expected output CSV (types optimized) from outputs/ once per
+    session. Returns copies, since the tests sort and cast them.
+    """
+    results = {}
+
+    def load(csv: str):
+        if csv not in results:
+            results[csv] = _load_expected(csv)
+
+        return results[csv].copy()
+
+    return load
+
+
+@pytest.fixture(scope="session")
+def expected_dict():
+    """
+    Load an expected renamed column dictionary JSON from outputs/. Returns a
+    copy, since the cached dictionary is shared.
+    """
+
+    def load(dict_json: str):
+        return copy.deepcopy(load_expected_dict(OUTPUTS / dict_json))
+
+    return load
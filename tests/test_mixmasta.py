@@ -3,388 +3,530 @@
 """Tests for `mixmasta` package."""
 
 
-import unittest
-import warnings
+import pytest
 
 from click.testing import CliRunner
 import subprocess
 import logging
 import json
 from mixmasta import cli, mixmasta
-from pandas.util.testing import assert_frame_equal, assert_dict_equal
+from pandas.testing import assert_frame_equal
+import numpy as np
 import pandas as pd
-import gc
-import os
+import pathlib
+import time
+import xarray as xr
+from datetime import datetime
 
-if os.name == 'nt':
-    sep = '\\'
-else:
-    sep = '/'
+INPUTS = pathlib.Path(__file__).parent / "inputs"
+OUTPUTS = pathlib.Path(__file__).parent / "outputs"
 
 logger = logging.getLogger(__name__)
 
-class TestMixmaster(unittest.TestCase):
-    """Tests for `mixmasta` package."""
-
-    def setUp(self):
-        """Set up test fixtures, if any."""
-
-        # turn off warnings unless refactoring.
-        warnings.simplefilter('ignore')
-
-    def tearDown(self):
-        """Tear down test fixtures, if any."""
-        gc.collect()
-        # Delete any output parquet files.
-        try:
-            os.remove(f"outputs{sep}unittests.parquet.gzip")
-        except:
-            pass
-
-        try:
-           os.remove(f"outputs{sep}unittests_str.parquet.gzip")
-        except:
-            pass
-
-    def test_001_process(self):
-        """Test ISO2 primary_geo; build a date day, month, year; no primary_date; feature qualifies another feature."""
-
-        # Define mixmasta inputs:
-        mp = f"inputs{sep}test1_input.json"
-        fp = f"inputs{sep}test1_input.csv"
-        geo = 'admin2'
-        outf = f"outputs{sep}unittests"
-
-        # Process:
-        df, dct = mixmasta.process(fp, mp, geo, outf)
-
-        # Load expected output:
-        output_df = pd.read_csv(f'outputs{sep}test1_output.csv', index_col=False)
-        output_df = mixmasta.optimize_df_types(output_df)
-        with open(f'outputs{sep}test1_dict.json') as f:
-            output_dict = json.loads(f.read())
-
-        # Sort both data frames and reindex for comparison,.
-        cols = ['timestamp','country','admin1','admin2','admin3','lat','lng','feature','value']
-        df.sort_values(by=cols, inplace=True)
-        output_df.sort_values(by=cols, inplace=True)
-        df.reset_index(drop=True, inplace=True)
-        output_df.reset_index(drop =True, inplace=True)
-
-        # Assertions
-        assert_frame_equal(df, output_df)
-        assert_dict_equal(dct, output_dict)
-
-    def test_002_process(self):
-        """
-        Test GeoTiff This tests that multi-band geotiff processing is the same. Uses the
-        asset_wealth tif which has 4 bands of different years representing a
-        measure of wealth.
-        """
-
-        # Define mixmasta inputs:
-        mp = f'inputs{sep}test2_assetwealth_input.json'
-        fp = f'inputs{sep}test2_assetwealth_input.tif'
-        geo = 'admin2'
-        outf = f'outputs{sep}unittests'
-
-        # Process:
-        df, dct = mixmasta.process(fp, mp, geo, outf)
-        #categories = df.select_dtypes(include=['category']).columns.tolist()
-        df['value'] = df['value'].astype('str')
-
-        # Load expected output:
-        output_df = pd.read_csv(f'outputs{sep}test2_assetwealth_output.csv', index_col=False)
-
-        with open(f'outputs{sep}test2_assetwealth_dict.json') as f:
-            output_dict = json.loads(f.read())
-
-        # Sort both data frames and reindex for comparison,.
-        cols = ['timestamp','country','admin1','admin2','admin3','lat','lng','feature','value']
-        df = df[cols]
-        output_df = output_df[cols]
-
-        # Optimize datatypes for output_df.
-        floats = output_df.select_dtypes(include=['float64']).columns.tolist()
-        output_df[floats] = output_df[floats].apply(pd.to_numeric, downcast='float')
-
-        ints = output_df.select_dtypes(include=['int64']).columns.tolist()
-        output_df[ints] = output_df[ints].apply(pd.to_numeric, downcast='integer')
-
-        # Standardize value and feature columns to str for comparison.
-        df['value'] = df['value'].astype('str')
-        df['feature'] = df['feature'].astype('str')
-        output_df['value'] = output_df['value'].astype('str')
-        output_df['feature'] = output_df['feature'].astype('str')
-
-        # Sort and reindex.
-        df.sort_values(by=cols, inplace=True)
-        df.reset_index(drop=True, inplace=True)
-        output_df.sort_values(by=cols, inplace=True)
-        output_df.reset_index(drop =True, inplace=True)
-
-        # Assertions
-        assert_frame_equal(df, output_df, check_categorical = False)
-        assert_dict_equal(dct, output_dict)
-
-    def test_003_process(self):
-        """Test qualifies, lat/lng primary geo."""
-
-        # Define mixmasta inputs:
-        mp = f'inputs{sep}test3_qualifies.json'
-        fp = f'inputs{sep}test3_qualifies.csv'
-        geo = 'admin2'
-        outf = f'outputs{sep}unittests'
-
-        # Process:
-        df, dct = mixmasta.process(fp, mp, geo, outf)
-
-        # Load expected output:
-        output_df = pd.read_csv(f'outputs{sep}test3_qualifies_output.csv', index_col=False)
-        output_df = mixmasta.optimize_df_types(output_df)
-        with open(f'outputs{sep}test3_qualifies_dict.json') as f:
-            output_dict = json.loads(f.read())
-
-        # Sort both data frames and reindex for comparison,.
-        cols = ['timestamp','country','admin1','admin2','admin3','lat','lng','feature','value']
-        df.sort_values(by=cols, inplace=True)
-        output_df.sort_values(by=cols, inplace=True)
-
-        df.reset_index(drop=True, inplace=True)
-        output_df.reset_index(drop =True, inplace=True)
-
-        # Make the datatypes the same for value/feature columns.
-        df['value'] = df['value'].astype('str')
-        df['feature'] = df['feature'].astype('str')
-        output_df['value'] = output_df['value'].astype('str')
-        output_df['feature'] = output_df['feature'].astype('str')
-
-        # Assertions
-        assert_frame_equal(df, output_df, check_categorical = False)
-        assert_dict_equal(dct, output_dict)
-
-    def test_004_process(self):
-        """Test .xlxs file, qualifies col with multi dtypes."""
-
-        # Define mixmasta inputs:
-        mp = f'inputs{sep}test4_rainfall_error.json'
-        fp = f'inputs{sep}test4_rainfall_error.xlsx'
-        geo = 'admin2'
-        outf = f'outputs{sep}unittests'
-
-        # Process:
-        df, dct = mixmasta.process(fp, mp, geo, outf)
-
-        # Load expected output:
-        output_df = pd.read_csv(f'outputs{sep}test4_rainfall_error_output.csv', index_col=False)
-        output_df = mixmasta.optimize_df_types(output_df)
-        with open(f'outputs{sep}test4_rainfall_error_dict.json') as f:
-            output_dict = json.loads(f.read())
-
-        # Sort both data frames and reindex for comparison,.
-        cols = ['timestamp','country','admin1','admin2','admin3','lat','lng','feature','value','MainCause']
-        df.sort_values(by=cols, inplace=True)
-        output_df.sort_values(by=cols, inplace=True)
-
-        df.reset_index(drop=True, inplace=True)
-        output_df.reset_index(drop =True, inplace=True)
-
-        # Make the datatypes the same for value/feature and qualifying columns.
-        df['value'] = df['value'].astype('str')
-        df['feature'] = df['feature'].astype('str')
-        df['MainCause'] = df['MainCause'].astype('str')
-        output_df['value'] = output_df['value'].astype('str')
-        output_df['feature'] = output_df['feature'].astype('str')
-        output_df['MainCause'] = output_df['MainCause'].astype('str')
-
-        # Assertions
-        assert_frame_equal(df, output_df, check_categorical = False)
-        assert_dict_equal(dct, output_dict)
-
-    def test_005__command_line_interface(self):
-        """Test the CLI and causemosify-multi."""
-        """
-        runner = CliRunner()
-        result = runner.invoke(cli.main)
-        assert result.exit_code == 0
-        assert "mixmasta.cli.main" in result.output
-        help_result = runner.invoke(cli.main, ["--help"])
-        assert help_result.exit_code == 0
-        assert "--help  Show this message and exit." in help_result.output
-
-        """
-
-        # Confirm CLI --help is available.
-        result = subprocess.run(['mixmasta', '--help'], capture_output=True, encoding='utf-8')
-        self.assertIn('Processor for generating CauseMos compliant datasets.', result.stdout)
-        self.assertIn('--help  Show this message and exit.', result.stdout)
-        self.assertEqual(result.returncode, 0)
-        self.assertIn('causemosify-multi  Process multiple input files to generate a single',result.stdout)
-
-
-        # Confirm CLI causemosify-multi --help is available.
-        result = subprocess.run(['mixmasta', "causemosify-multi", "--help"], capture_output=True, encoding='utf-8')
-        self.assertEqual(result.returncode, 0)
-        self.assertIn('Process multiple input files to generate a single CauseMos compliant',result.stdout)
-
-        # Run causemosify-multi
-        inputs = "--inputs=[{\"input_file\": \"inputs" + f"{sep}test1_input.csv\",\"mapper\": \"inputs{sep}test1_input.json\"" + "},{\"input_file\": \""
-        inputs = inputs + f"inputs{sep}test3_qualifies.csv\",\"mapper\": \"inputs{sep}test3_qualifies.json\"" + "}]"
-        result = subprocess.run(['mixmasta', "causemosify-multi", inputs, "--geo=admin2", f"--output-file=outputs{sep}unittests"], capture_output=True, encoding='utf-8')
-        if (result.returncode != 0):
-            print(result)
-        self.assertEqual(result.returncode, 0)
-        
-        ## Compare parquet files.
-        df1 = pd.read_parquet(f"outputs{sep}unittests.1.parquet.gzip")
-        df2 = pd.read_parquet(f"outputs{sep}unittests.2.parquet.gzip")
-        df = df1.append(df2)
-        output_df = pd.read_parquet(f"outputs{sep}test5.parquet.gzip")
-
-        # Sort both data frames and reindex for comparison,.
-        cols = ['timestamp','country','admin1','admin2','admin3','lat','lng','feature','value']
-        df.sort_values(by=cols, inplace=True)
-        output_df.sort_values(by=cols, inplace=True)
-        df.reset_index(drop=True, inplace=True)
-        output_df.reset_index(drop =True, inplace=True)
-
-        logger.info(df.shape)
-        logger.info(output_df.shape)
-
-        # Assertion
-        assert_frame_equal(df, output_df, check_categorical = False)
-
-        ## Compare str.parquet file.
-        df = pd.read_parquet(f"outputs{sep}unittests_str.2.parquet.gzip")
-        output_df = pd.read_parquet(f"outputs{sep}test5_str.parquet.gzip")
-
-        # Sort both data frames and reindex for comparison,.
-        cols = ['timestamp','country','admin1','admin2','admin3','lat','lng','feature','value']
-        df.sort_values(by=cols, inplace=True)
-        output_df.sort_values(by=cols, inplace=True)
-        df.reset_index(drop=True, inplace=True)
-        output_df.reset_index(drop =True, inplace=True)
-
-        # Assertion
-        assert_frame_equal(df, output_df, check_categorical = False)
-
-    def test_006_process(self):
-        """Test multi primary_geo, resolve_to_gadm"""
-
-        # Define mixmasta inputs:
-        mp = f'inputs{sep}test6_hoa_conflict_input.json'
-        fp = f'inputs{sep}test6_hoa_conflict_input.csv'
-        geo = 'admin2'
-        outf = f'outputs{sep}unittests'
-
-        # Process:
-        df, dct = mixmasta.process(fp, mp, geo, outf)
-
-        # Load expected output:
-        output_df = pd.read_csv(f'outputs{sep}test6_hoa_conflict_output.csv', index_col=False)
-        output_df = mixmasta.optimize_df_types(output_df)
-        with open(f'outputs{sep}test6_hoa_conflict_dict.json') as f:
-            output_dict = json.loads(f.read())
-
-        # Sort both data frames and reindex for comparison,.
-        cols = ['timestamp','country','admin1','admin2','admin3','lat','lng','feature','value']
-        df.sort_values(by=cols, inplace=True)
-        output_df.sort_values(by=cols, inplace=True)
-
-        df.reset_index(drop=True, inplace=True)
-        output_df.reset_index(drop =True, inplace=True)
-
-        # Make the datatypes the same for value/feature and qualifying columns.
-        df['value'] = df['value'].astype('str')
-        df['feature'] = df['feature'].astype('str')
-        output_df['value'] = output_df['value'].astype('str')
-        output_df['feature'] = output_df['feature'].astype('str')
-
-        # Assertions
-        assert_frame_equal(df, output_df, check_categorical = False)
-        assert_dict_equal(dct, output_dict)
-
-    def test_007_single_band_tif(self):
-        """ This tests single-band geotiff processing."""
-
-        # Define mixmasta inputs:
-        mp = f'inputs{sep}test7_single_band_tif_input.json'
-        fp = f'inputs{sep}test7_single_band_tif_input.tif'
-        geo = 'admin2'
-        outf = f'outputs{sep}unittests'
-
-        # Process:
-        df, dct = mixmasta.process(fp, mp, geo, outf)
-        #categories = df.select_dtypes(include=['category']).columns.tolist()
-        df['value'] = df['value'].astype('str')
-
-        # Load expected output:
-        output_df = pd.read_csv(f'outputs{sep}test7_single_band_tif_output.csv', index_col=False)
-
-        with open(f'outputs{sep}test7_single_band_tif_dict.json') as f:
-            output_dict = json.loads(f.read())
-
-        # Sort both data frames and reindex for comparison,.
-        cols = ['timestamp','country','admin1','admin2','admin3','lat','lng','feature','value']
-        df = df[cols]
-        output_df = output_df[cols]
-
-        # Optimize datatypes for output_df.
-        floats = output_df.select_dtypes(include=['float64']).columns.tolist()
-        output_df[floats] = output_df[floats].apply(pd.to_numeric, downcast='float')
-
-        ints = output_df.select_dtypes(include=['int64']).columns.tolist()
-        output_df[ints] = output_df[ints].apply(pd.to_numeric, downcast='integer')
-
-        # Standardize value and feature columns to str for comparison.
-        df['value'] = df['value'].astype('str')
-        df['feature'] = df['feature'].astype('str')
-        output_df['value'] = output_df['value'].astype('str')
-        output_df['feature'] = output_df['feature'].astype('str')
-
-        # Sort and reindex.
-        df.sort_values(by=cols, inplace=True)
-        df.reset_index(drop=True, inplace=True)
+# CliRunner holds no state between invokes, so the CLI tests share one.
+runner = CliRunner(mix_stderr=False)
+
+# Columns the processed and expected frames are sorted and compared on.
+COLS = ('timestamp','country','admin1','admin2','admin3','lat','lng','feature','value')
+COLS_WITH_MAINCAUSE = COLS + ('MainCause',)
+
+
+CASES = [
+    # ISO2 primary_geo; build a date day, month, year; no primary_date; feature qualifies another feature.
+    dict(
+        name="001_process",
+        fp="test1_input.csv",
+        mp="test1_input.json",
+        csv="test1_output.csv",
+        dict_json="test1_dict.json",
+        str_cols=(),
+        check_categorical=True,
+    ),
+    # Multi-band geotiff; the asset_wealth tif has 4 bands of different years
+    # representing a measure of wealth.
+    pytest.param(
+        dict(
+            name="002_assetwealth_tif",
+            fp="test2_assetwealth_input.tif",
+            mp="test2_assetwealth_input.json",
+            csv="test2_assetwealth_output.csv",
+            dict_json="test2_assetwealth_dict.json",
+            str_cols=('value','feature'),
+            select_cols=True,
+        ),
+        marks=pytest.mark.slow,
+    ),
+    # Qualifies, lat/lng primary geo.
+    dict(
+        name="003_qualifies",
+        fp="test3_qualifies.csv",
+        mp="test3_qualifies.json",
+        csv="test3_qualifies_output.csv",
+        dict_json="test3_qualifies_dict.json",
+        str_cols=('value','feature'),
+    ),
+    # .xlxs file, qualifies col with multi dtypes.
+    dict(
+        name="004_rainfall_xlsx",
+        fp="test4_rainfall_error.xlsx",
+        mp="test4_rainfall_error.json",
+        csv="test4_rainfall_error_output.csv",
+        dict_json="test4_rainfall_error_dict.json",
+        cols=COLS_WITH_MAINCAUSE,
+        str_cols=('value','feature','MainCause'),
+    ),
+    # Multi primary_geo, resolve_to_gadm.
+    dict(
+        name="006_hoa_conflict",
+        fp="test6_hoa_conflict_input.csv",
+        mp="test6_hoa_conflict_input.json",
+        csv="test6_hoa_conflict_output.csv",
+        dict_json="test6_hoa_conflict_dict.json",
+        str_cols=('value','feature'),
+    ),
+    # Single-band geotiff.
+    pytest.param(
+        dict(
+            name="007_single_band_tif",
+            fp="test7_single_band_tif_input.tif",
+            mp="test7_single_band_tif_input.json",
+            csv="test7_single_band_tif_output.csv",
+            dict_json="test7_single_band_tif_dict.json",
+            str_cols=('value','feature'),
+            select_cols=True,
+        ),
+        marks=pytest.mark.slow,
+    ),
+]
+
+
+def _sorted(df, cols):
+    """Sort a data frame on cols and reindex it in one step for comparison."""
+    return df.sort_values(list(cols), ignore_index=True, kind="stable")
+
+
+def _assert_process_matches(case, df, output_df):
+    """
+    Compare a processed data frame with the expected output of a case: cast
+    the case's str_cols on both sides, sort on the case's cols (COLS by
+    default) and reindex, then assert_frame_equal.
+    """
+    cols = case.get('cols', COLS)
+    if case.get('select_cols'):
+        df = df[list(cols)]
+        output_df = output_df[list(cols)]
+
+    # Make the datatypes the same for value/feature and qualifying columns.
+    str_types = dict.fromkeys(case['str_cols'], 'str')
+    df = df.astype(str_types)
+    output_df = output_df.astype(str_types)
+
+    # Assertions
+    assert_frame_equal(_sorted(df, cols), _sorted(output_df, cols), check_categorical = case.get('check_categorical', False))
+
+
+@pytest.mark.parametrize("case", CASES, ids=lambda c: c["name"])
+def test_process(case, processed, expected, expected_dict):
+    """
+    Test mixmasta.process output matches the expected output CSV and renamed
+    column dictionary. Both are asserted in one test so each case is
+    processed once, even when pytest-xdist spreads tests across workers.
+    """
+
+    df, dct = processed(case['fp'], case['mp'])
+
+    _assert_process_matches(case, df, expected(case['csv']))
+    assert dct == expected_dict(case['dict_json'])
+
+
+def test_005__command_line_interface(tmp_path, monkeypatch):
+    """Test the CLI and causemosify-multi."""
+
+    # Confirm the installed CLI --help is available.
+    result = subprocess.run(['mixmasta', '--help'], capture_output=True, encoding='utf-8')
+    assert 'Processor for generating CauseMos compliant datasets.' in result.stdout
+    assert '--help  Show this message and exit.' in result.stdout
+    assert result.returncode == 0
+    assert 'causemosify-multi  Process multiple input files to generate a single' in result.stdout
+
+
+    # Confirm CLI causemosify-multi --help is available.
+    result = runner.invoke(cli.cli, ["causemosify-multi", "--help"])
+    assert result.exit_code == 0
+    assert 'Process multiple input files to generate a single CauseMos compliant' in result.output
+
+    # Run causemosify-multi in-process.
+    inputs = json.dumps([
+        {"input_file": str(INPUTS / "test1_input.csv"), "mapper": str(INPUTS / "test1_input.json")},
+        {"input_file": str(INPUTS / "test3_qualifies.csv"), "mapper": str(INPUTS / "test3_qualifies.json")},
+    ], separators=(',', ':'))
+    # causemosify-multi stages its chunks as pickles in the working directory,
+    # so run it from tmp_path to keep concurrent runs apart.
+    monkeypatch.chdir(tmp_path)
+    result = runner.invoke(cli.cli, ["causemosify-multi", f"--inputs={inputs}", "--geo=admin2", "--output-file=unittests", "--compression=snappy"])
+    if (result.exit_code != 0):
+        print(result.output, result.stderr, result.exception)
+    assert result.exit_code == 0
+
+    ## Compare parquet files.
+    df1 = pd.read_parquet(tmp_path / "unittests.1.parquet")
+    df2 = pd.read_parquet(tmp_path / "unittests.2.parquet")
+    df = pd.concat([df1, df2], ignore_index=True)
+    output_df = pd.read_parquet(OUTPUTS / "test5.parquet.gzip")
+
+    logger.info(df.shape)
+    logger.info(output_df.shape)
+
+    # Assertion
+    assert_frame_equal(_sorted(df, COLS), _sorted(output_df, COLS), check_categorical = False)
+
+    ## Compare str.parquet file.
+    df = pd.read_parquet(tmp_path / "unittests_str.2.parquet")
+    output_df = pd.read_parquet(OUTPUTS / "test5_str.parquet.gzip")
+
+    # Assertion
+    assert_frame_equal(_sorted(df, COLS), _sorted(output_df, COLS), check_categorical = False)
+
+
+def test_008_aliases(tmp_path, monkeypatch):
+    """ This tests feature name aliases."""
+
+    inputs = json.dumps([
+        {"input_file": str(INPUTS / "test8_aliases_input.csv"), "mapper": str(INPUTS / "test8_aliases_input.json")},
+    ], separators=(',', ':'))
+    # causemosify-multi stages its chunks as pickles in the working directory,
+    # so run it from tmp_path to keep concurrent runs apart.
+    monkeypatch.chdir(tmp_path)
+    result = runner.invoke(cli.cli, ["causemosify-multi", f"--inputs={inputs}", "--geo=admin2", "--output-file=unittests", "--compression=snappy"])
 
-        output_df.sort_values(by=cols, inplace=True)
-        output_df.reset_index(drop=True, inplace=True)
+    if (result.exit_code != 0):
+        print(result.output, result.stderr, result.exception)
+    assert result.exit_code == 0
+
+    ## Compare parquet files.
+    df1 = pd.read_parquet(tmp_path / "unittests.1.parquet")
+    df2 = pd.read_parquet(tmp_path / "unittests_str.1.parquet")
+    df = pd.concat([df1, df2], ignore_index=True)
+
+    output_df_1 = pd.read_parquet(OUTPUTS / "test8_aliases.parquet.gzip")
+    output_df_2 = pd.read_parquet(OUTPUTS / "test8_aliases_str.parquet.gzip")
+    output_df = pd.concat([output_df_1, output_df_2], ignore_index=True)
+
+    # Assertions
+    assert_frame_equal(df, output_df, check_categorical = False)
+
+
+def test_009_format_time():
+    """Test compiled time formats parse the same as datetime.strptime."""
+
+    cases = [
+        ('5/12/20 12:20', '%m/%d/%y %H:%M'),
+        ('05/12/2020', '%m/%d/%Y'),
+        ('2020-1-5', '%Y-%m-%d'),
+        ('2020-01-05', '%Y-%m-%d'),
+        ('2020-01-05T10:20:30', '%Y-%m-%dT%H:%M:%S'),
+        ('2020-01-05 10:20:30', '%Y-%m-%d %H:%M:%S'),
+        ('2021-03-26 00:00:00', '%Y-%m-%d'),
+        ('26.03.2021', '%d.%m.%Y'),
+        ('March 26, 2021', '%B %d, %Y'),
+    ]
+    for t, time_format in cases:
+        expected = int(datetime.strptime(t.replace(' 00:00:00', ''), time_format).timestamp()) * 1000
+        assert mixmasta.format_time(t, time_format) == expected
+
+    # Unparseable dates return None unless validating.
+    assert mixmasta.format_time('2021-02-30', '%Y-%m-%d', validate=False) is None
+    with pytest.raises(Exception):
+        mixmasta.format_time('2021-02-30', '%Y-%m-%d')
+
+
+def test_010_format_time_series():
+    """Test vectorized epoch conversion of a series of dates matches format_time."""
+
+    # Naive times are local, as in format_time and datetime.timestamp().
+    mar26 = int(datetime(2021, 3, 26).timestamp()) * 1000
+    mar27 = int(datetime(2021, 3, 27).timestamp()) * 1000
+
+    s = pd.Series(['3/26/2021', 'bad', None])
+    epoch = mixmasta.format_time_series(s, '%m/%d/%Y', validate=False)
+    assert epoch.iloc[0] == mar26 == mixmasta.format_time('3/26/2021', '%m/%d/%Y')
+    assert epoch.iloc[1:].isna().all()
+
+    # Excel dates read as Timestamps drop the ' 00:00:00' suffix.
+    s = pd.Series(['2021-03-26 00:00:00', '2021-03-27'])
+    assert mixmasta.format_time_series(s, '%Y-%m-%d').tolist() == [mar26, mar27]
+
+    # Times around DST changes agree with format_time.
+    times = ['2021-11-07 01:30:00', '2021-03-14 02:30:00', '2021-06-01 12:00:00']
+    expected = [mixmasta.format_time(t, '%Y-%m-%d %H:%M:%S') for t in times]
+    assert mixmasta.format_time_series(pd.Series(times), '%Y-%m-%d %H:%M:%S').tolist() == expected
+
+    with pytest.raises(Exception):
+        mixmasta.format_time_series(pd.Series(['bad']), '%Y-%m-%d')
+
+    # Series already parsed to datetime64 are converted without reparsing.
+    s = pd.to_datetime(pd.Series(['2021-03-26', '2021-03-27']))
+    assert mixmasta.format_time_series(s, '%m/%d/%Y').tolist() == [mar26, mar27]
+
+
+@pytest.mark.slow
+def test_011_raster2df_multi():
+    """Test converting bands in a process pool matches converting them one by one."""
+
+    fp = str(INPUTS / 'test2_assetwealth_input.tif')
+    rasters = [
+        {"InRaster": fp, "feature_name": "wealth", "band": 1, "date": "2018-01-01"},
+        {"InRaster": fp, "feature_name": "wealth", "band": 2, "date": "2019-01-01"},
+    ]
+
+    df = mixmasta.raster2df_multi(rasters, max_workers=2)
+    expected = pd.concat([mixmasta.raster2df(**kwargs) for kwargs in rasters], ignore_index=True)
+
+    assert_frame_equal(df, expected)
+
+    # Plain paths use the raster2df defaults.
+    fp = str(INPUTS / 'test7_single_band_tif_input.tif')
+    df = mixmasta.raster2df_multi([fp, fp], max_workers=2)
+    expected = pd.concat([mixmasta.raster2df(fp)] * 2, ignore_index=True)
+
+    assert_frame_equal(df, expected)
+
+
+def test_012_csv2df_date_types(tmp_path):
+    """Test csv2df reads epoch and standalone date columns as numbers and date strings as str."""
 
-        # Assertions
-        assert_frame_equal(df, output_df, check_categorical = False)
-        assert_dict_equal(dct, output_dict)
+    fp = tmp_path / "dates.csv"
+    fp.write_text(
+        "epoch,date,year,assoc_year,assoc_month,value\n"
+        "1616716800000,2021-03-26,2021,2021,03,1.5\n"
+        "1616803200000,2021-03-27,2020,2020,04,2.5\n"
+    )
+    mapper = {
+        "date": [
+            {"name": "epoch", "date_type": "epoch", "primary_date": True},
+            {"name": "date", "date_type": "date", "time_format": "%Y-%m-%d"},
+            {"name": "year", "date_type": "year"},
+            {"name": "assoc_year", "date_type": "year", "associated_columns": {"Month": "assoc_month"}},
+            {"name": "assoc_month", "date_type": "month", "associated_columns": {"Year": "assoc_year"}},
+        ],
+        "feature": [{"name": "value", "feature_type": "float"}],
+    }
 
-    def test_008_aliases(self):
-        """ This tests feature name aliases."""
+    df = mixmasta.csv2df(str(fp), mapper)
+
+    assert pd.api.types.is_integer_dtype(df["epoch"])
+    assert df["epoch"].tolist() == [1616716800000, 1616803200000]
+    assert pd.api.types.is_integer_dtype(df["year"])
+    assert df["date"].tolist() == ["2021-03-26", "2021-03-27"]
+    assert df["assoc_month"].tolist() == ["03", "04"]
+    assert df["assoc_year"].tolist() == ["2021", "2020"]
 
-        # Define mixmasta inputs:
-        mp = f'inputs{sep}test8_aliases_input.json'
-        fp = f'inputs{sep}test8_aliases_input.csv'
-        geo = 'admin2'
-        outf = f'outputs{sep}unittests'
 
-        inputs = "--inputs=[{\"input_file\": \"inputs" + f"{sep}test8_aliases_input.csv\",\"mapper\": \"inputs{sep}test8_aliases_input.json\"" + "}]"
-        result = subprocess.run(['mixmasta', "causemosify-multi", inputs, "--geo=admin2", f"--output-file=outputs{sep}unittests"], capture_output=True, encoding='utf-8')
+@pytest.mark.slow
+def test_013_raster2parquet(tmp_path):
+    """Test streaming a raster to parquet writes the rows of raster2df."""
 
-        if (result.returncode != 0):
-            print(result)
-        self.assertEqual(result.returncode, 0)
+    fp = str(INPUTS / 'test7_single_band_tif_input.tif')
+    kwargs = dict(feature_name="Hopper Presence Prediction", band=1, date="01/01/2021")
+    output_file = tmp_path / "raster.parquet.gzip"
 
-        ## Compare parquet files.
-        df1 = pd.read_parquet(f"outputs{sep}unittests.1.parquet.gzip")
-        df2 = pd.read_parquet(f"outputs{sep}unittests_str.1.parquet.gzip")
-        df = df1.append(df2)
+    count = mixmasta.raster2parquet(fp, str(output_file), **kwargs)
+    expected = mixmasta.raster2df(fp, **kwargs)
+    cols = list(expected.columns)
 
-        output_df_1 = pd.read_parquet(f"outputs{sep}test8_aliases.parquet.gzip")
-        output_df_2 = pd.read_parquet(f"outputs{sep}test8_aliases_str.parquet.gzip")
-        output_df = output_df_1.append(output_df_2)
+    df = pd.read_parquet(output_file)
+    assert count == len(df) == len(expected)
+    assert list(df.columns) == cols
+    assert_frame_equal(
+        df.sort_values(by=cols).reset_index(drop=True),
+        expected.sort_values(by=cols).reset_index(drop=True),
+        check_dtype=False,
+    )
 
-        # Assertions
-        assert_frame_equal(df, output_df, check_categorical = False)
+    # No pixels to write (the raster has no band 2) still writes the columns.
+    output_file = tmp_path / "empty.parquet.gzip"
+    assert mixmasta.raster2parquet(fp, str(output_file), **{**kwargs, "band": 2}) == 0
+    df = pd.read_parquet(output_file)
+    assert df.empty
+    assert list(df.columns) == cols
 
 
-if __name__ == '__main__':
-    unittest.main()
+# Band dtypes the valid pixel kernels are used for.
+KERNEL_DTYPES = ('int8', 'uint8', 'int16', 'uint16', 'int32', 'uint32', 'int64', 'uint64', 'float32', 'float64')
 
+
+def _assert_valid_pixels(kernel, dtype):
+    """Assert kernel selects the same pixels as np.nonzero(arr > nodata)."""
+
+    rng = np.random.default_rng(0)
+    arr = rng.integers(0, 100, size=(37, 53)).astype(dtype)
+    if arr.dtype.kind == 'f':
+        nodata = -9999.0
+        arr[::7, ::3] = nodata
+        arr[::5, 1::4] = np.nan
+    else:
+        nodata = 0
+        arr[::7, ::3] = nodata
+
+    rows, cols, values = kernel(arr, np.float64(nodata))
+
+    expected_rows, expected_cols = np.nonzero(arr > nodata)
+    np.testing.assert_array_equal(rows, expected_rows)
+    np.testing.assert_array_equal(cols, expected_cols)
+    np.testing.assert_array_equal(values, arr[expected_rows, expected_cols])
+    assert values.dtype == arr.dtype
+
+
+@pytest.mark.parametrize("dtype", KERNEL_DTYPES)
+def test_014_valid_pixels_numba(dtype):
+    """Test the numba valid pixel kernel matches numpy."""
+
+    if mixmasta._valid_pixels_numba is None:
+        pytest.skip("numba is not installed")
+
+    _assert_valid_pixels(mixmasta._valid_pixels_numba, dtype)
+
+
+@pytest.mark.parametrize("dtype", KERNEL_DTYPES)
+def test_015_valid_pixels_cython(dtype):
+    """Test the compiled valid pixel kernel matches numpy."""
+
+    raster_kernel = pytest.importorskip("mixmasta._raster_kernel")
+
+    _assert_valid_pixels(raster_kernel.valid_pixels, dtype)
+
+
+def _netcdf_dataset() -> xr.Dataset:
+    """A small dataset with a 3D variable, a 2D variable and a NaN value."""
+
+    rng = np.random.default_rng(0)
+    rainfall = rng.random((3, 2, 4))
+    rainfall[1, 0, 2] = np.nan
+
+    return xr.Dataset(
+        {
+            "rainfall": (("time", "lat", "lon"), rainfall),
+            "elevation": (("lat", "lon"), rng.integers(0, 1000, size=(2, 4)).astype("int32")),
+        },
+        coords={
+            "time": pd.date_range("2021-01-01", periods=3),
+            "lat": [10.5, 11.5],
+            "lon": [30.0, 30.5, 31.0, 31.5],
+        },
+    )
+
+
+def test_016_netcdf2df_netcdf3(tmp_path):
+    """Test netcdf2df of a NetCDF3 file matches xarray's to_dataframe."""
+
+    pytest.importorskip("scipy")
+
+    fp = str(tmp_path / "netcdf3.nc")
+    _netcdf_dataset().to_netcdf(fp, format="NETCDF3_64BIT", engine="scipy")
+
+    with xr.open_dataset(fp) as ds:
+        expected = ds.to_dataframe().reset_index()
+
+    assert_frame_equal(mixmasta.netcdf2df(fp), expected)
+
+
+def test_017_netcdf2df_netcdf4(tmp_path):
+    """Test netcdf2df of a NetCDF4 file matches xarray's to_dataframe."""
+
+    pytest.importorskip("h5netcdf")
+
+    fp = str(tmp_path / "netcdf4.nc")
+    _netcdf_dataset().to_netcdf(fp, format="NETCDF4", engine="h5netcdf")
+
+    with xr.open_dataset(fp) as ds:
+        expected = ds.to_dataframe().reset_index()
+
+    assert_frame_equal(mixmasta.netcdf2df(fp), expected)
+
+
+@pytest.mark.parametrize("tz", ["UTC", "America/New_York"])
+def test_018_format_time_series_out_of_range(monkeypatch, tz):
+    """Test out of range and negative years give None, as in format_time, on any host timezone."""
+
+    if not hasattr(time, "tzset"):
+        pytest.skip("time.tzset is not available")
+
+    monkeypatch.setenv("TZ", tz)
+    time.tzset()
+    try:
+        for t, time_format in [
+            ('0001-01-01', '%Y-%m-%d'),
+            ('1/1/0001', '%m/%d/%Y'),
+            ('-2021', '%Y'),
+            ('-9999', '%Y'),
+        ]:
+            assert mixmasta.format_time(t, time_format, validate=False) is None
+
+            epoch = mixmasta.format_time_series(pd.Series([t]), time_format, validate=False)
+            assert epoch.isna().all()
+
+        # In range values still match format_time.
+        times = pd.Series(['1/1/1500', '3/26/2021', '12/31/9999'])
+        expected = [mixmasta.format_time(t, '%m/%d/%Y') for t in times]
+        assert mixmasta.format_time_series(times, '%m/%d/%Y').tolist() == expected
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_019_csv2df_str_columns(tmp_path):
+    """Test csv2df reads str features, geo names and qualifier columns as str, not dates or numbers."""
+
+    fp = tmp_path / "features.csv"
+    fp.write_text(
+        "lat,lng,admin1,event_date,code,source,value\n"
+        "10.5,30.0,01,2021-03-26,007,1,1.5\n"
+        "11.5,30.5,02,2021-03-27 12:00:00,010,2,2.5\n"
+    )
+    mapper = {
+        "geo": [
+            {"name": "lat", "geo_type": "latitude", "primary_geo": True, "is_geo_pair": "lng"},
+            {"name": "lng", "geo_type": "longitude", "primary_geo": True, "is_geo_pair": "lat"},
+            {"name": "admin1", "geo_type": "state/territory"},
+        ],
+        "feature": [
+            {"name": "event_date", "feature_type": "str"},
+            {"name": "code", "feature_type": "str"},
+            {"name": "source", "feature_type": "int", "qualifies": ["value"]},
+            {"name": "value", "feature_type": "float"},
+        ],
+    }
+
+    df = mixmasta.csv2df(str(fp), mapper)
+
+    for col in ("admin1", "event_date", "code", "source"):
+        assert (df[col].map(type) == str).all(), col
+    assert df["event_date"].tolist() == ["2021-03-26", "2021-03-27 12:00:00"]
+    assert df["code"].tolist() == ["007", "010"]
+    assert df["admin1"].tolist() == ["01", "02"]
+    assert df["source"].tolist() == ["1", "2"]
+    assert pd.api.types.is_float_dtype(df["lat"])
+    assert pd.api.types.is_float_dtype(df["value"])
+
+
+def test_020_build_date_qualifies_field():
+    """Test associated date fields match the column they qualify in any order."""
+
+    qualified_col_dict = {
+        'rainfall': ['region'],
+        'pop': ['month_column', 'day_column', 'year_column'],
+        'pop2': ['year_column', 'day_column', 'month_column'],
+    }
+
+    assert mixmasta.build_date_qualifies_field(
+        qualified_col_dict, ['month_column', 'day_column', 'year_column']) == 'pop'
+    # associated_columns order need not follow the qualifies lists; the first match wins.
+    assert mixmasta.build_date_qualifies_field(
+        qualified_col_dict, ['day_column', 'year_column', 'month_column']) == 'pop'
+    assert mixmasta.build_date_qualifies_field(
+        qualified_col_dict, ['day_column', 'year_column']) is None
+
+
+"""
+Test by: > cd tests && python3 -m pytest test_mixmasta.py -v -n auto -m ""
 """
-Test by: > /usr/bin/python3.8 -m unittest /workspaces/mixmasta/tests/test_mixmasta.py -v
-"""
\ No newline at end of file